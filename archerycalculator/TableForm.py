@@ -1,4 +1,4 @@
-from wtforms import Form, validators, SelectField, BooleanField
+from wtforms import Form, validators, DecimalField, SelectField, BooleanField
 
 
 class HandicapTableForm(Form):
@@ -32,6 +32,22 @@ class HandicapTableForm(Form):
     )
     allowance = BooleanField(label="Create Allowance Table", false_values=(False, ""))
 
+    # Advanced options
+    hc_min = DecimalField(label="Lowest handicap", default=0, places=2)
+    hc_max = DecimalField(label="Highest handicap", default=150, places=2)
+    hc_step = DecimalField(label="Handicap step", default=1, places=2)
+    scheme = SelectField(
+        label="Handicap Scheme",
+        choices=[
+            ("AGB", "Archery GB"),
+            ("AGBold", "Old Archery GB"),
+            ("AA", "Archery Australia"),
+            ("AA2", "Old Archery Australia"),
+        ],
+        coerce=str,
+        validate_choice=False,
+    )
+
 
 class ClassificationTableForm(Form):
     bowstyle = SelectField("Bowstyle", [validators.InputRequired("Please provide.")])
@@ -2,7 +2,18 @@ import os
 
 from flask import Flask
 
-from archerycalculator import db
+from archerycalculator import (
+    class_scores,
+    db,
+    handicap_book,
+    hc_lookup,
+    html_tables,
+    response_cache,
+    score_file,
+    snapshot,
+    startup,
+    timing,
+)
 
 
 def create_app(test_config=None):
@@ -11,6 +22,22 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY="dev",
         DATABASE=os.path.join(app.instance_path, "archerycalculator.sqlite"),
+        DATABASE_MMAP_SIZE=64 * 1024 * 1024,
+        DATABASE_CACHE_SIZE=-16000,
+        DATABASE_CACHED_STATEMENTS=256,
+        HC_LOOKUP_DIR=os.path.join(app.instance_path, "hc_lookup"),
+        HANDICAP_BOOK_DIR=os.path.join(app.instance_path, "handicap_book"),
+        API_MAX_RECORDS=10000,
+        CLASS_SCORES_FILE=os.path.join(app.instance_path, "class_scores.npz"),
+        TIMING_ENABLED=False,
+        RESPONSE_CACHE="memory",
+        RESPONSE_CACHE_SIZE=1024,
+        RESPONSE_CACHE_TTL=3600,
+        RESPONSE_CACHE_FILE=os.path.join(app.instance_path, "response_cache.sqlite"),
+        SNAPSHOT_FILE=os.path.join(app.instance_path, "snapshot.bin"),
+        WARM_UP=False,
+        ROUNDS_PAGE_MAX_AGE=3600,
+        TEMPLATE_CACHE_DIR=os.path.join(app.instance_path, "template_cache"),
     )
 
     if test_config is None:
@@ -36,6 +63,7 @@ def create_app(test_config=None):
 
     from archerycalculator import rounds
     app.register_blueprint(rounds.bp)
+    rounds.init_app(app)
 
     from archerycalculator import info
     app.register_blueprint(info.bp)
@@ -46,7 +74,19 @@ def create_app(test_config=None):
     from archerycalculator import extras
     app.register_blueprint(extras.bp)
 
+    from archerycalculator import api
+    app.register_blueprint(api.bp)
+
     db.init_app(app)
+    html_tables.init_app(app)
+    hc_lookup.init_app(app)
+    handicap_book.init_app(app)
+    class_scores.init_app(app)
+    snapshot.init_app(app)
+    timing.init_app(app)
+    response_cache.init_app(app)
+    score_file.init_app(app)
+    startup.init_app(app)
 
     return app
 
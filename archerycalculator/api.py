@@ -0,0 +1,256 @@
+import math
+
+from flask import (
+    Blueprint,
+    current_app,
+    jsonify,
+    request,
+)
+
+from archerycalculator import (
+    class_scores,
+    hc_lookup,
+    refdata,
+    registry,
+    round_search,
+    timing,
+)
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+SCHEMES = ["AGB", "AGBold", "AA", "AA2"]
+
+
+@timing.timed("classification")
+def _classify(codename, round_obj, scores, bowstyle, gender, age):
+    """
+    Classifications for many scores in one category on one round
+
+    Follows the same rules as calculator.calculator, classifying all the
+    scores at once against the category's cached thresholds.
+
+    Parameters
+    ----------
+    codename : str
+        codename of the round, already converted for compound scoring
+    round_obj : archeryutils.Round
+        round the scores were shot on
+    scores : np.ndarray
+        scores to classify
+    bowstyle, gender, age : str
+        category of the archer
+
+    Returns
+    -------
+    classifications : list of str
+        classification for each score
+
+    References
+    ----------
+    """
+    discipline = class_scores.round_discipline(round_obj)
+    if discipline is None:
+        return ["not currently available"] * len(scores)
+    return class_scores.classify(
+        discipline, codename, scores, bowstyle.lower(), gender.lower(), age.lower()
+    )
+
+
+def check_record(record, reference):
+    """
+    Validate a record of a score and resolve the round it was shot on.
+
+    Parameters
+    ----------
+    record : dict
+        'round', 'score', 'bowstyle', 'gender' and 'age', and optionally
+        'scheme' (default AGB) and 'diameter' in mm (default scheme value)
+    reference : dict
+        reference data as returned by refdata.get_refdata()
+
+    Returns
+    -------
+    checked : dict or None
+        the record's values with 'codename' of the round, converted for
+        compound scoring as on the calculator page, or None if the record is
+        invalid
+    error : str or None
+        reason the record is invalid
+
+    References
+    ----------
+    """
+    try:
+        roundname = record["round"]
+        bowstyle = record["bowstyle"]
+        gender = record["gender"]
+        age = record["age"]
+        # Non-strings, e.g. lists from JSON, cannot be looked up
+        if not all(isinstance(v, str) for v in [roundname, bowstyle, gender, age]):
+            raise TypeError("round, bowstyle, gender and age must be strings")
+        score = float(record["score"])
+        scheme = record.get("scheme", "AGB")
+        diameter = float(record.get("diameter", 0.0)) * 1.0e-3
+        # NaN passes the range checks below and never converges when solved
+        if not (math.isfinite(score) and math.isfinite(diameter)):
+            raise ValueError("score and diameter must be finite")
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None, (
+            "Records need a round, score, bowstyle, gender and age, "
+            "and numeric score and diameter."
+        )
+    if diameter == 0.0:
+        diameter = None
+
+    if bowstyle not in reference["bowstyles"]:
+        return None, "Invalid bowstyle."
+    if gender not in reference["genders"]:
+        return None, "Invalid gender."
+    if age not in reference["ages"]["age_group"]:
+        return None, "Invalid age group."
+    if scheme not in SCHEMES:
+        return None, f"Invalid scheme '{scheme}'."
+
+    codename = registry.get_codename(
+        roundname, compound=bowstyle.lower() in ["compound"]
+    )
+    if codename is None:
+        return None, f"Invalid round name '{roundname}'."
+    max_score = registry.get_round(codename).max_score()
+    if score <= 0:
+        return None, "A score of 0 or less is not valid."
+    if score > max_score:
+        return None, (
+            f"{score:g} is larger than the maximum possible "
+            f"score of {int(max_score)} for a {roundname}."
+        )
+
+    checked = {
+        "round": roundname,
+        "codename": codename,
+        "score": score,
+        "scheme": scheme,
+        "diameter": diameter,
+        "bowstyle": bowstyle,
+        "gender": gender,
+        "age": age,
+    }
+    return checked, None
+
+
+def score_records(checked):
+    """
+    Handicaps and classifications for validated records.
+
+    Records sharing a round and scheme, or a round and category, are solved
+    together in one vectorised pass.
+
+    Parameters
+    ----------
+    checked : list of dict
+        records as returned by check_record()
+
+    Returns
+    -------
+    results : list of dict
+        'round', 'score', 'handicap', 'decimal_handicap' and 'classification'
+        for each record
+
+    References
+    ----------
+    """
+    results = [{"round": c["round"], "score": c["score"]} for c in checked]
+    hc_groups = {}
+    class_groups = {}
+    for i, c in enumerate(checked):
+        hc_groups.setdefault((c["codename"], c["scheme"], c["diameter"]), []).append(i)
+        class_groups.setdefault(
+            (c["codename"], c["bowstyle"], c["gender"], c["age"]), []
+        ).append(i)
+
+    for (codename, scheme, diameter), indices in hc_groups.items():
+        scores = np.asarray([results[i]["score"] for i in indices])
+        int_hcs = hc_lookup.handicap_from_score(
+            scores, codename, scheme, diameter=diameter, int_prec=True
+        )
+        decimal_hcs = hc_lookup.handicap_from_score(
+            scores, codename, scheme, diameter=diameter, int_prec=False
+        )
+        for i, int_hc, decimal_hc in zip(indices, int_hcs, decimal_hcs):
+            results[i]["handicap"] = int(int_hc)
+            results[i]["decimal_handicap"] = float(decimal_hc)
+
+    for (codename, bowstyle, gender, age), indices in class_groups.items():
+        scores = np.asarray([results[i]["score"] for i in indices])
+        classifications = _classify(
+            codename,
+            registry.get_round(codename),
+            scores,
+            bowstyle,
+            gender,
+            age,
+        )
+        for i, classification in zip(indices, classifications):
+            results[i]["classification"] = classification
+
+    return results
+
+
+@bp.route("/handicap", methods=("POST",))
+def handicap():
+    """
+    Handicaps and classifications for a batch of scores.
+
+    Expects a JSON list of records (or an object with a 'records' list), each
+    with 'round', 'score', 'bowstyle', 'gender' and 'age' and optionally
+    'scheme' (default AGB) and 'diameter' in mm (default scheme value).
+    Returns a result for each record in the same order, with an 'error' entry
+    in place of results for any invalid records.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get("records")
+    if not isinstance(payload, list):
+        return jsonify(error="Expected a JSON list of records."), 400
+    max_records = current_app.config["API_MAX_RECORDS"]
+    if len(payload) > max_records:
+        return (
+            jsonify(error=f"Too many records, send at most {max_records} at once."),
+            413,
+        )
+
+    reference = refdata.get_refdata()
+    results = [{} for _ in payload]
+    valid = []
+    for i, record in enumerate(payload):
+        checked, error = check_record(record, reference)
+        if error is not None:
+            results[i]["error"] = error
+        else:
+            valid.append((i, checked))
+
+    scored = score_records([checked for _, checked in valid])
+    for (i, _), result in zip(valid, scored):
+        results[i] = result
+
+    return jsonify(results=results)
+
+
+@bp.route("/rounds/search", methods=("GET",))
+def search_rounds():
+    """
+    Rounds matching a search, for the round dropdowns.
+
+    Takes the text typed in 'q' and the 'page' of results to return, and
+    responds in the format expected by Select2's AJAX mode.
+    """
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    return jsonify(round_search.search(request.args.get("q", ""), page))
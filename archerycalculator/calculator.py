@@ -4,13 +4,19 @@ from flask import (
     request,
 )
 
-from archeryutils import load_rounds
-from archeryutils.handicaps import handicap_equations as hc_eq
-from archeryutils.handicaps import handicap_functions as hc_func
-from archeryutils.classifications import classifications as class_func
+from archerycalculator import (
+    HCForm,
+    class_scores,
+    hc_lookup,
+    refdata,
+    response_cache,
+    timing,
+)
+from archerycalculator.db import query_db
+from archerycalculator.lazy import lazy_import
 
-from archerycalculator import HCForm, utils
-from archerycalculator.db import query_db, sql_to_dol
+# Imported on first use to keep start up fast
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
 
 
 bp = Blueprint("calculator", __name__, url_prefix="/")
@@ -18,29 +24,19 @@ bp = Blueprint("calculator", __name__, url_prefix="/")
 
 # Single home page (for now)
 @bp.route("/", methods=("GET", "POST"))
+@response_cache.cached
 def calculator():
 
-    # Set form choices
-    bowstylelist = sql_to_dol(query_db("SELECT bowstyle,disciplines FROM bowstyles"))[
-        "bowstyle"
-    ]
-    genderlist = sql_to_dol(query_db("SELECT gender FROM genders"))["gender"]
-    roundnames = sql_to_dol(query_db("SELECT code_name,round_name FROM rounds"))
-    roundnames = utils.indoor_display_filter(
-        dict(zip(roundnames["code_name"], roundnames["round_name"]))
-    )
-    agelist = sql_to_dol(query_db("SELECT age_group FROM ages"))["age_group"]
-
     # Load form and set defaults
     form = HCForm.HCForm(
         request.form,
     )
 
-    # Set form choices
-    form.bowstyle.choices = [""] + bowstylelist
-    form.gender.choices = [""] + genderlist
-    form.age.choices = [""] + agelist
-    form.roundname.choices = [""] + roundnames
+    # Set form choices from the cached reference data
+    form.bowstyle.choices = refdata.choices("bowstyle", blank=True)
+    form.gender.choices = refdata.choices("gender", blank=True)
+    form.age.choices = refdata.choices("age", blank=True)
+    form.roundname.choices = refdata.round_choices(form.roundname.data)
 
     error = None
     warning_bowstyle = None
@@ -70,20 +66,16 @@ def calculator():
 
         # Check the inputs are all valid
         # No longer need to check dropdowns, but leave in case
-        bowstylecheck = query_db(
-            "SELECT id FROM bowstyles WHERE bowstyle IS (?)", [bowstyle]
-        )
-        if len(bowstylecheck) == 0:
+        reference = refdata.get_refdata()
+        if bowstyle not in reference["bowstyles"]:
             error = "Invalid bowstyle. Please select from dropdown."
         results["bowstyle"] = bowstyle
 
-        gendercheck = query_db("SELECT id FROM genders WHERE gender IS (?)", [gender])
-        if len(gendercheck) == 0:
+        if gender not in reference["genders"]:
             error = "Please select gender from dropdown options."
         results["gender"] = gender
 
-        agecheck = query_db("SELECT id FROM ages WHERE age_group IS (?)", [age])
-        if len(agecheck) == 0:
+        if age not in reference["ages"]["age_group"]:
             error = "Invalid age group. Please select from dropdown."
         results["age"] = age
 
@@ -96,40 +88,27 @@ def calculator():
 
         if error is None:
 
-            all_rounds_objs = load_rounds.read_json_to_round_dict(
-                [
-                    "AGB_outdoor_imperial.json",
-                    "AGB_outdoor_metric.json",
-                    "AGB_indoor.json",
-                    "WA_outdoor.json",
-                    "WA_indoor.json",
-                    "WA_field.json",
-                    "IFAA_field.json",
-                    "AGB_VI.json",
-                    "WA_VI.json",
-                    "Custom.json",
-                ]
-            )
             # Get the appropriate round from the database
             round_db_info = query_db(
                 "SELECT * FROM rounds WHERE round_name IS (?)",
                 [roundname],
                 one=True,
             )
-            round_codename = round_db_info["code_name"]
             round_location = round_db_info["location"]
             round_body = round_db_info["body"]
 
             # Check if we need compound scoring
             if bowstyle.lower() in ["compound"]:
-                round_codename = utils.get_compound_codename(round_codename)
-            round_obj = all_rounds_objs[round_codename]
+                round_codename = round_db_info["compound_code_name"]
+            else:
+                round_codename = round_db_info["code_name"]
 
             # Generate the handicap params
             hc_params = hc_eq.HcParams()
 
             # Check score against maximum score and return error if inappropriate
-            max_score = round_obj.max_score()
+            # Stored with the round, compound scoring has the same maximum
+            max_score = round_db_info["max_score"]
             if int(score) <= 0:
                 error = "A score of 0 or less is not valid."
             elif int(score) > max_score:
@@ -141,79 +120,78 @@ def calculator():
             results["maxscore"] = int(max_score)
 
             if error is None:
-                # Calculate the handicap
-                hc_from_score = hc_func.handicap_from_score(
+                # Calculate the handicap from the precomputed score tables
+                hc_from_score = hc_lookup.handicap_from_score(
                     float(score),
-                    round_obj,
+                    round_codename,
                     scheme,
-                    hc_params,
-                    arw_d=diameter,
+                    diameter=diameter,
                     int_prec=True,
+                    hc_params=hc_params,
                 )
                 results["handicap"] = hc_from_score
 
                 if not integer_precision:
-                    decimal_hc_from_score = hc_func.handicap_from_score(
+                    decimal_hc_from_score = hc_lookup.handicap_from_score(
                         float(score),
-                        round_obj,
+                        round_codename,
                         scheme,
-                        hc_params,
-                        arw_d=diameter,
+                        diameter=diameter,
                         int_prec=integer_precision,
+                        hc_params=hc_params,
                     )
                     results["decimal_handicap"] = decimal_hc_from_score
 
                 # Calculate the classification
-                if round_location in ["outdoor"] and round_body in ["AGB", "WA"]:
-                    # TODO: Consider re-assigning bowstyle here for cleaner code,
-                    #   rather than in archeryutils?
-                    if bowstyle.lower() in ["traditional", "flatbow"]:
-                        warning_bowstyle = f"Note: Treating {bowstyle} as Barebow for the purposes of classifications."
-
-                    class_from_score = class_func.calculate_AGB_outdoor_classification(
-                        round_codename,
-                        float(score),
-                        bowstyle.lower(),
-                        gender.lower(),
-                        age.lower(),
-                    )
-                    class_from_score = query_db(
-                        "SELECT longname FROM classes WHERE shortname IS (?)",
-                        [class_from_score],
-                        one=True,
-                    )["longname"]
-                    results["classification"] = class_from_score
-
-                elif round_location in ["indoor"] and round_body in ["AGB", "WA"]:
-                    # TODO: Consider re-assigning bowstyle here for cleaner code,
-                    #   rather than in archeryutils?
-                    if bowstyle.lower() not in ["compound", "recurve"]:
-                        warning_bowstyle = f"Note: Treating {bowstyle} as Recurve for the purposes of classifications."
-
-                    class_from_score = class_func.calculate_AGB_indoor_classification(
-                        round_codename,
-                        float(score),
-                        bowstyle.lower(),
-                        gender.lower(),
-                        age.lower(),
-                    )
-                    results["classification"] = class_from_score
-                    if scheme == "AGB":
-                        warning_handicap_system = "Note: This handicap uses the new scheme that will come into effect for indoor rounds from July 2023. To use the 'old' scheme for 2022/2023 please select 'Old Archery GB' in the advanced options below."
-
-                elif round_location in ["field"] and round_body in ["AGB", "WA"]:
-                    class_from_score = class_func.calculate_AGB_field_classification(
-                        round_codename,
-                        float(score),
-                        bowstyle.lower(),
-                        gender.lower(),
-                        age.lower(),
-                    )
-                    results["classification"] = class_from_score
-                    warning_handicap_round = "Note: This round is not officially recognised by Archery GB for the purposes of handicapping."
-                else:
-                    results["classification"] = "not currently available"
-                    warning_handicap_round = "Note: This round is not officially recognised by Archery GB for the purposes of handicapping."
+                with timing.timer("classification"):
+                    if round_location in ["outdoor"] and round_body in ["AGB", "WA"]:
+                        # TODO: Consider re-assigning bowstyle here for cleaner code,
+                        #   rather than in archeryutils?
+                        if bowstyle.lower() in ["traditional", "flatbow"]:
+                            warning_bowstyle = f"Note: Treating {bowstyle} as Barebow for the purposes of classifications."
+
+                        class_from_score = class_scores.classify(
+                            "outdoor",
+                            round_codename,
+                            float(score),
+                            bowstyle.lower(),
+                            gender.lower(),
+                            age.lower(),
+                        )[0]
+                        results["classification"] = class_from_score
+
+                    elif round_location in ["indoor"] and round_body in ["AGB", "WA"]:
+                        # TODO: Consider re-assigning bowstyle here for cleaner code,
+                        #   rather than in archeryutils?
+                        if bowstyle.lower() not in ["compound", "recurve"]:
+                            warning_bowstyle = f"Note: Treating {bowstyle} as Recurve for the purposes of classifications."
+
+                        class_from_score = class_scores.classify(
+                            "indoor",
+                            round_codename,
+                            float(score),
+                            bowstyle.lower(),
+                            gender.lower(),
+                            age.lower(),
+                        )[0]
+                        results["classification"] = class_from_score
+                        if scheme == "AGB":
+                            warning_handicap_system = "Note: This handicap uses the new scheme that will come into effect for indoor rounds from July 2023. To use the 'old' scheme for 2022/2023 please select 'Old Archery GB' in the advanced options below."
+
+                    elif round_location in ["field"] and round_body in ["AGB", "WA"]:
+                        class_from_score = class_scores.classify(
+                            "field",
+                            round_codename,
+                            float(score),
+                            bowstyle.lower(),
+                            gender.lower(),
+                            age.lower(),
+                        )[0]
+                        results["classification"] = class_from_score
+                        warning_handicap_round = "Note: This round is not officially recognised by Archery GB for the purposes of handicapping."
+                    else:
+                        results["classification"] = "not currently available"
+                        warning_handicap_round = "Note: This round is not officially recognised by Archery GB for the purposes of handicapping."
 
                 # Other stats
                 RAD2DEG = 57.295779513
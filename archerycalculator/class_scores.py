@@ -0,0 +1,417 @@
+import os
+import threading
+
+import click
+from flask import current_app
+
+from archerycalculator import refdata, registry, timing, utils
+from archerycalculator.db import data_stamp
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+class_func = lazy_import("archeryutils.classifications.classifications")
+
+# Indoor and field classes, best first, as the classes table is outdoor only
+INDOOR_CLASSES = ["A", "B", "C", "D", "E", "F", "G", "H"]
+FIELD_CLASSES = ["GMB", "MB", "B", "1", "2", "3"]
+
+# Names of the archeryutils functions, looked up when first needed
+SCORE_FUNCS = {
+    "outdoor": "AGB_outdoor_classification_scores",
+    "indoor": "AGB_indoor_classification_scores",
+    "field": "AGB_field_classification_scores",
+}
+
+# Stores for each database, built on first use
+_stores = {}
+
+# Prepared thresholds and class names for each category, built on first use
+_classifiers = {}
+
+# Data stamp of each database when its stores and classifiers were built
+_stamps = {}
+# Held while the caches above are checked or changed, not while building
+_lock = threading.Lock()
+
+
+def _category_bowstyle(discipline, bowstyle):
+    # Traditional and flatbow use barebow classifications outdoors
+    if discipline == "outdoor" and bowstyle.lower() in ["traditional", "flatbow"]:
+        return "barebow"
+    return bowstyle
+
+
+def _axes(discipline):
+    reference = refdata.get_refdata()
+    rounds = registry.get_rounds()
+
+    if discipline == "field":
+        codenames = [c for c in rounds if c.startswith("wa_field_24_")]
+        n_classes = len(FIELD_CLASSES)
+    else:
+        codenames = [
+            c
+            for c, round_obj in rounds.items()
+            if round_obj.location == discipline and round_obj.body in ["AGB", "WA"]
+        ]
+        if discipline == "indoor":
+            n_classes = len(INDOOR_CLASSES)
+        else:
+            n_classes = len([c for c in reference["classes"] if c != "UC"])
+
+    return {
+        "rounds": tuple(codenames),
+        "bowstyles": tuple(reference["bowstyles"]),
+        "genders": tuple(reference["genders"]),
+        "ages": tuple(reference["ages"]["age_group"]),
+        "n_classes": n_classes,
+    }
+
+
+def _new_store(axes):
+    # NaN marks categories not yet computed
+    shape = [len(axes[k]) for k in ["rounds", "bowstyles", "genders", "ages"]]
+    return {
+        "axes": axes,
+        "index": {
+            k: {label.lower(): i for i, label in enumerate(axes[k])}
+            for k in ["rounds", "bowstyles", "genders", "ages"]
+        },
+        "scores": np.full(shape + [axes["n_classes"]], np.nan),
+    }
+
+
+def _load_stores(filename):
+    stores = {}
+    if filename is None or not os.path.exists(filename):
+        return stores
+    with np.load(filename) as stored:
+        for discipline in SCORE_FUNCS:
+            if f"{discipline}_scores" not in stored.files:
+                continue
+            axes = {
+                k: tuple(stored[f"{discipline}_{k}"].tolist())
+                for k in ["rounds", "bowstyles", "genders", "ages"]
+            }
+            axes["n_classes"] = stored[f"{discipline}_scores"].shape[-1]
+            store = _new_store(axes)
+            store["scores"][...] = stored[f"{discipline}_scores"]
+            stores[discipline] = store
+    return stores
+
+
+def _check_stamp(database):
+    # Drop anything built from an earlier version of the database, call with
+    # _lock held
+    stamp = data_stamp(database)
+    if _stamps.get(database) != stamp:
+        for cache in [_stores, _classifiers]:
+            for key in [key for key in cache if key[0] == database]:
+                del cache[key]
+        _stamps[database] = stamp
+
+
+def get_store(discipline):
+    """
+    Get the classification score store for a discipline.
+
+    Loaded from the app's CLASS_SCORES_FILE if it matches the current rounds
+    and reference data, otherwise started empty and filled as categories are
+    requested.
+
+    Parameters
+    ----------
+    discipline : str
+        one of 'outdoor', 'indoor' or 'field'
+
+    Returns
+    -------
+    store : dict
+        'axes' labels, 'index' from lowercase label to position and 'scores'
+        array indexed by [round, bowstyle, gender, age, class]
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    key = (database, discipline)
+    with _lock:
+        _check_stamp(database)
+        store = _stores.get(key)
+    if store is None:
+        axes = _axes(discipline)
+        store = _load_stores(current_app.config.get("CLASS_SCORES_FILE")).get(
+            discipline
+        )
+        if store is None or store["axes"] != axes:
+            store = _new_store(axes)
+        # Another thread may have got there first, use its store if so
+        with _lock:
+            store = _stores.setdefault(key, store)
+    return store
+
+
+def _compute(discipline, codename, bowstyle, gender, age):
+    return np.asarray(
+        getattr(class_func, SCORE_FUNCS[discipline])(
+            codename, _category_bowstyle(discipline, bowstyle), gender, age
+        ),
+        dtype=float,
+    )
+
+
+@timing.timed("classification")
+def classification_scores(discipline, codenames, bowstyle, gender, age):
+    """
+    Classification thresholds for several rounds in one category.
+
+    Parameters
+    ----------
+    discipline : str
+        one of 'outdoor', 'indoor' or 'field'
+    codenames : list of str
+        rounds to get thresholds for
+    bowstyle, gender, age : str
+        category to get thresholds for, as in the database
+
+    Returns
+    -------
+    scores : np.ndarray
+        thresholds with one row per round from highest to lowest class,
+        -9999 where a class is not available
+
+    References
+    ----------
+    """
+    store = get_store(discipline)
+    if len(codenames) == 0:
+        return np.zeros([0, store["axes"]["n_classes"]])
+    index = store["index"]
+    try:
+        category = (
+            index["bowstyles"][bowstyle.lower()],
+            index["genders"][gender.lower()],
+            index["ages"][age.lower()],
+        )
+        round_idx = [index["rounds"][c.lower()] for c in codenames]
+    except KeyError:
+        # Not a stored category so calculate directly
+        return np.asarray(
+            [_compute(discipline, c, bowstyle, gender, age) for c in codenames]
+        ).reshape(len(codenames), -1)
+
+    block = store["scores"][(round_idx,) + category]
+    for i in np.flatnonzero(np.isnan(block[:, 0])):
+        block[i] = _compute(discipline, codenames[i], bowstyle, gender, age)
+        if not store["scores"].flags.writeable:
+            # Shared read-only from a snapshot, so fill in a private copy
+            store["scores"] = store["scores"].copy()
+        store["scores"][(round_idx[i],) + category] = block[i]
+    return block
+
+
+def round_discipline(round_obj):
+    """
+    Classification scheme that applies to a round.
+
+    Parameters
+    ----------
+    round_obj : archeryutils.Round
+        round to check
+
+    Returns
+    -------
+    discipline : str or None
+        'outdoor', 'indoor' or 'field', or None if the round has no
+        Archery GB classifications
+
+    References
+    ----------
+    """
+    if round_obj.location in SCORE_FUNCS and round_obj.body in ["AGB", "WA"]:
+        return round_obj.location
+    return None
+
+
+def _class_names(discipline):
+    if discipline == "indoor":
+        return list(INDOOR_CLASSES)
+    if discipline == "field":
+        return list(FIELD_CLASSES)
+    # Outdoor classes are reported by their long names
+    reference = refdata.get_refdata()
+    longnames = reference["class_longnames"]
+    return [longnames.get(c, c) for c in reference["classes"] if c != "UC"]
+
+
+def _unclassified(discipline):
+    if discipline == "outdoor":
+        return refdata.get_refdata()["class_longnames"].get("UC", "UC")
+    if discipline == "field":
+        return "unclassified"
+    return "UC"
+
+
+def _field_eligible(codename, bowstyle):
+    # Sighted bowstyles classify on red pegs and unsighted ones on blue pegs,
+    # both only on 24 target rounds
+    if bowstyle.lower() in ["compound", "recurve"]:
+        return "wa_field_24_red_" in codename
+    if bowstyle.lower() in ["barebow", "longbow", "traditional", "flatbow"]:
+        return "wa_field_24_blue_" in codename
+    return True
+
+
+def _get_classifier(discipline, codename, bowstyle, gender, age):
+    database = current_app.config["DATABASE"]
+    key = (
+        database,
+        discipline,
+        codename,
+        bowstyle.lower(),
+        gender.lower(),
+        age.lower(),
+    )
+    with _lock:
+        _check_stamp(database)
+        classifier = _classifiers.get(key)
+    if classifier is None:
+        if discipline == "field" and not _field_eligible(codename, bowstyle):
+            # No class can be reached on this round
+            reached_at = np.empty(0)
+            names = [_unclassified(discipline)]
+        else:
+            thresholds = classification_scores(
+                discipline, [codename], bowstyle, gender, age
+            )[0]
+            # A score gets the highest class whose threshold it reaches, so
+            # each class is effectively reached at the lowest threshold of
+            # those above it. Unavailable classes are never reached.
+            thresholds = np.where(thresholds < 0, np.inf, thresholds)
+            reached_at = np.minimum.accumulate(thresholds)[::-1].copy()
+            names = _class_names(discipline) + [_unclassified(discipline)]
+        classifier = (reached_at, np.asarray(names, dtype=object))
+        with _lock:
+            classifier = _classifiers.setdefault(key, classifier)
+    return classifier
+
+
+def classify(discipline, codename, scores, bowstyle, gender, age):
+    """
+    Classifications for any number of scores in one category on one round.
+
+    Matches the archeryutils calculate_AGB_*_classification functions, with
+    outdoor classes given by their long names.
+
+    Parameters
+    ----------
+    discipline : str
+        one of 'outdoor', 'indoor' or 'field'
+    codename : str
+        codename of the round, already converted for compound scoring
+    scores : float or array_like
+        scores to classify
+    bowstyle, gender, age : str
+        category of the archer, as in the database
+
+    Returns
+    -------
+    classifications : list of str
+        classification for each score
+
+    References
+    ----------
+    """
+    reached_at, names = _get_classifier(discipline, codename, bowstyle, gender, age)
+    n_reached = np.searchsorted(reached_at, np.ravel(scores), side="right")
+    return names[len(reached_at) - n_reached].tolist()
+
+
+def build_stores(filename=None):
+    """
+    Fill the stores for every category and optionally save them.
+
+    Parameters
+    ----------
+    filename : str
+        .npz file to save the stores to
+
+    Returns
+    -------
+    n_filled, n_failed : int
+        number of categories calculated and number archeryutils rejected
+
+    References
+    ----------
+    """
+    n_filled = 0
+    n_failed = 0
+    arrays = {}
+    for discipline in SCORE_FUNCS:
+        store = get_store(discipline)
+        axes = store["axes"]
+        scores = store["scores"]
+        for idx in np.ndindex(*scores.shape[:-1]):
+            if not np.isnan(scores[idx][0]):
+                continue
+            labels = [
+                axes[k][i]
+                for k, i in zip(["rounds", "bowstyles", "genders", "ages"], idx)
+            ]
+            try:
+                scores[idx] = _compute(discipline, *labels)
+                n_filled += 1
+            except Exception:
+                # Not every category is valid for every round, leave these empty
+                n_failed += 1
+
+        arrays[f"{discipline}_scores"] = scores
+        for k in ["rounds", "bowstyles", "genders", "ages"]:
+            arrays[f"{discipline}_{k}"] = np.asarray(axes[k])
+
+    if filename is not None:
+        utils.save_npz(filename, arrays)
+    return n_filled, n_failed
+
+
+def preload(stores):
+    """
+    Use stores for the current app's database loaded elsewhere.
+
+    Parameters
+    ----------
+    stores : dict of str: dict
+        disciplines mapped to stores as returned by get_store()
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    with _lock:
+        _check_stamp(database)
+        for discipline, store in stores.items():
+            _stores[(database, discipline)] = store
+
+
+def invalidate():
+    """Drop the stores so they are rebuilt against new reference data."""
+    with _lock:
+        _stores.clear()
+        _classifiers.clear()
+        _stamps.clear()
+
+
+# define command line argument 'build-class-scores' to precompute all categories
+@click.command("build-class-scores")
+def build_class_scores_command():
+    """Calculate classification scores for every category and save them."""
+    n_filled, n_failed = build_stores(current_app.config["CLASS_SCORES_FILE"])
+    click.echo(
+        f"Calculated {n_filled} classification categories ({n_failed} not available)."
+    )
+
+
+def init_app(app):
+    # add build_class_scores_command to be called from flask app
+    app.cli.add_command(build_class_scores_command)
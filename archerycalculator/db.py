@@ -1,42 +1,189 @@
+import os
+import pathlib
 import sqlite3
+import threading
 
 import click
 from flask import current_app, g
 
-from archerycalculator import populate_db
+from archerycalculator import populate_db, timing
+
+# Long lived read-only connections for each thread, keyed by database path
+_local = threading.local()
+# Bumped when the database is rebuilt so that pooled connections are replaced
+_generation = 0
+
+
+def _connect_readonly(database):
+    # The reference data is only written by init-db, so requests never write
+    db = sqlite3.connect(
+        pathlib.Path(database).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=current_app.config["DATABASE_CACHED_STATEMENTS"],
+    )
+    # Return rows as dicts when using cursor
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA query_only=ON")
+    db.execute(f"PRAGMA mmap_size={int(current_app.config['DATABASE_MMAP_SIZE'])}")
+    db.execute(f"PRAGMA cache_size={int(current_app.config['DATABASE_CACHE_SIZE'])}")
+    return db
 
 
 def get_db():
+    """
+    Get a read-only connection to the app's database.
+
+    Connections are kept open and reused by later requests on the same thread,
+    and replaced if the process has forked or the database has been rebuilt.
+    """
+    database = current_app.config["DATABASE"]
+    if not hasattr(_local, "connections"):
+        _local.connections = {}
+
+    owner = (os.getpid(), _generation)
+    pooled = _local.connections.get(database)
+    if pooled is None or pooled[1] != owner:
+        if pooled is not None and pooled[1][0] == owner[0]:
+            pooled[0].close()
+        pooled = (_connect_readonly(database), owner)
+        _local.connections[database] = pooled
+
+    return pooled[0]
+
+
+def _file_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return (0, 0)
+    if stat.st_size == 0:
+        # An empty write-ahead log, as created by the first reader or left by
+        # a checkpoint, holds no changes
+        return (0, 0)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def data_stamp(database=None):
+    """
+    Stamp that changes whenever the database is written to.
+
+    Taken from the size and modification time of the database and its
+    write-ahead log, so it is cheap enough to check on every request and also
+    changes when the database is rebuilt by another process.
+
+    Parameters
+    ----------
+    database : str
+        database file, defaults to the app's DATABASE
+
+    Returns
+    -------
+    stamp : tuple of int
+        size and modification time in ns of the database and of its -wal
+        file, zeros for a missing or empty file
+
+    References
+    ----------
+    """
+    if database is None:
+        database = current_app.config["DATABASE"]
+    return _file_stamp(database) + _file_stamp(database + "-wal")
+
+
+def stamp_mtime(stamp):
+    """Last time in seconds the database with this data_stamp() was written."""
+    return max(stamp[1], stamp[3]) / 1.0e9
+
+
+def get_write_db():
     # g is object for unique requests to the database
-    if "db" not in g:
-        g.db = sqlite3.connect(
+    if "write_db" not in g:
+        g.write_db = sqlite3.connect(
             current_app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES
         )
         # Return rows as dicts when using cursor
-        g.db.row_factory = sqlite3.Row
+        g.write_db.row_factory = sqlite3.Row
 
-    return g.db
+    return g.write_db
 
 
 def close_db(e=None):
-    db = g.pop("db", None)
+    # Read-only connections stay open in the pool, only close the writer
+    db = g.pop("write_db", None)
 
     if db is not None:
         db.close()
 
 
-def init_db():
-    # call the SQL functions in the schema.sql file to init the tables in db
-    db = get_db()
-    with current_app.open_resource("schema.sql") as f:
-        db.executescript(f.read().decode("utf8"))
-    populate_db.load_bowstyles_to_db(db)
-    populate_db.load_ages_to_db(db)
-    populate_db.load_genders_to_db(db)
-    populate_db.load_rounds_to_db(db)
-    populate_db.load_classes_to_db(db)
-
-
+def init_db(incremental=False):
+    """
+    Build the database from the archeryutils data files.
+
+    Everything is written in a single transaction, so readers see either the
+    old or the new data.
+
+    Parameters
+    ----------
+    incremental : bool
+        update an existing database in place, only writing rows that have
+        changed, rather than recreating every table. A database without the
+        current schema is always rebuilt.
+
+    Returns
+    -------
+    n_changed : dict of str: int or None
+        rows written to each table for an incremental update, None if the
+        database was rebuilt
+
+    References
+    ----------
+    """
+    global _generation
+
+    db = get_write_db()
+    # WAL lets requests keep reading while the database is rebuilt
+    db.execute("PRAGMA journal_mode=WAL")
+
+    if incremental and populate_db.has_current_schema(db):
+        db.execute("BEGIN")
+        n_changed = populate_db.update_all(db)
+        db.commit()
+        close_db()
+        if not any(n_changed.values()):
+            # Nothing to reload
+            return n_changed
+    else:
+        n_changed = None
+        # call the SQL functions in the schema.sql file to init the tables in db
+        with current_app.open_resource("schema.sql") as f:
+            db.executescript("BEGIN;\n" + f.read().decode("utf8"))
+        populate_db.load_all(db)
+        db.commit()
+        close_db()
+
+    _generation += 1
+
+    # Imported here as these query the database through this module
+    from archerycalculator import (
+        class_scores,
+        refdata,
+        response_cache,
+        round_search,
+        rounds,
+        snapshot,
+    )
+
+    snapshot.invalidate()
+    refdata.invalidate()
+    class_scores.invalidate()
+    response_cache.invalidate()
+    rounds.invalidate()
+    round_search.invalidate()
+    return n_changed
+
+
+@timing.timed("db")
 def query_db(query, args=(), one=False):
     cur = get_db().execute(query, args)
     rv = cur.fetchall()
@@ -73,10 +220,22 @@ def sql_to_dol(sql_result):
 
 # define command line argument 'init-db' to run init_db function at startup
 @click.command("init-db")
-def init_db_command():
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only update rows that have changed in an existing database.",
+)
+def init_db_command(incremental):
     """Clear the existing data and create new tables."""
-    init_db()
-    click.echo("Initialized the database.")
+    n_changed = init_db(incremental=incremental)
+    if n_changed is None:
+        click.echo("Initialized the database.")
+    else:
+        click.echo(
+            "Updated the database: "
+            + ", ".join(f"{n} {table}" for table, n in n_changed.items())
+            + "."
+        )
 
 
 def init_app(app):
@@ -3,20 +3,30 @@ from flask import (
     render_template,
     request,
 )
-import numpy as np
 
 from archerycalculator.db import query_db, sql_to_dol
 
-from archeryutils import load_rounds
-from archeryutils.handicaps import handicap_equations as hc_eq
-from archeryutils.handicaps import handicap_functions as hc_func
+from archerycalculator import (
+    ExtrasForm,
+    refdata,
+    registry,
+    response_cache,
+    round_scores,
+    timing,
+    utils,
+)
+from archerycalculator.lazy import lazy_import
 
-from archerycalculator import ExtrasForm, utils
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
+hc_func = lazy_import("archeryutils.handicaps.handicap_functions")
 
 bp = Blueprint("extras", __name__, url_prefix="/extras")
 
 
 @bp.route("/groups", methods=("GET", "POST"))
+@response_cache.cached
 def groups():
 
     # Load form and set defaults
@@ -104,6 +114,7 @@ def groups():
 
 
 @bp.route("/roundscomparison", methods=("GET", "POST"))
+@response_cache.cached
 def roundcomparison():
 
     # Load form and set defaults
@@ -111,12 +122,9 @@ def roundcomparison():
         request.form,
     )
 
-    roundnames = sql_to_dol(query_db("SELECT code_name,round_name FROM rounds"))
-    roundnames = utils.indoor_display_filter(
-        dict(zip(roundnames["code_name"], roundnames["round_name"]))
-    )
+    roundnames = refdata.get_refdata()["round_names"]
 
-    form.roundname.choices = [""] + roundnames
+    form.roundname.choices = refdata.round_choices(form.roundname.data)
 
     error = None
     if request.method == "POST" and form.validate():
@@ -171,7 +179,8 @@ def roundcomparison():
         if request.form.getlist("virounds"):
             vi_rounds = sql_to_dol(
                 query_db(
-                    "SELECT code_name,round_name FROM rounds WHERE body in ('AGB-VI','WA-VI')"
+                    "SELECT code_name,round_name FROM rounds "
+                    "WHERE body in ('AGB-VI','WA-VI') ORDER BY id"
                 )
             )
             use_rounds["VI"] = vi_rounds
@@ -179,7 +188,8 @@ def roundcomparison():
         if request.form.getlist("unofficial"):
             unofficial_rounds = sql_to_dol(
                 query_db(
-                    "SELECT code_name,round_name FROM rounds WHERE body IN ('custom')"
+                    "SELECT code_name,round_name FROM rounds "
+                    "WHERE body IN ('custom') ORDER BY id"
                 )
             )
             use_rounds["Unofficial"] = unofficial_rounds
@@ -187,20 +197,7 @@ def roundcomparison():
         if len(use_rounds) == 0:
             error = "Please select one of more groups of rounds to compare to."
         else:
-            all_rounds_objs = load_rounds.read_json_to_round_dict(
-                [
-                    "AGB_outdoor_imperial.json",
-                    "AGB_outdoor_metric.json",
-                    "AGB_indoor.json",
-                    "WA_outdoor.json",
-                    "WA_indoor.json",
-                    "WA_field.json",
-                    "IFAA_field.json",
-                    "AGB_VI.json",
-                    "WA_VI.json",
-                    "Custom.json",
-                ]
-            )
+            all_rounds_objs = registry.get_rounds()
             # Get the appropriate round from the database
             round_db_info = query_db(
                 "SELECT * FROM rounds WHERE round_name IS (?)",
@@ -210,15 +207,16 @@ def roundcomparison():
             if round_db_info is None:
                 error = f"Invalid round name '{roundname}'. Please start typing and select from dropdown."
             else:
-                round_codename = round_db_info["code_name"]
-
                 # Check if we need compound scoring
                 if compound:
-                    round_codename = utils.get_compound_codename(round_codename)
+                    round_codename = round_db_info["compound_code_name"]
+                else:
+                    round_codename = round_db_info["code_name"]
                 round_obj = all_rounds_objs[round_codename]
 
                 # Check score against maximum score and return error if inappropriate
-                max_score = round_obj.max_score()
+                # Stored with the round, compound scoring has the same maximum
+                max_score = round_db_info["max_score"]
                 if int(score) <= 0:
                     error = "A score of 0 or less is not valid."
                 elif int(score) > max_score:
@@ -232,28 +230,27 @@ def roundcomparison():
 
                 if error is None:
                     # Calculate the handicap
-                    hc_from_score = hc_func.handicap_from_score(
-                        float(score),
-                        round_obj,
+                    with timing.timer("handicap"):
+                        hc_from_score = hc_func.handicap_from_score(
+                            float(score),
+                            round_obj,
+                            "AGB",
+                            hc_params,
+                            int_prec=False,
+                        )
+
+                    # Score every selected round in one batch
+                    # Don't round up to avoid conflicts where score is different to that input
+                    group_scores = round_scores.grouped_scores_for_rounds(
+                        {item: use_rounds[item]["code_name"] for item in use_rounds},
+                        hc_from_score,
                         "AGB",
                         hc_params,
-                        int_prec=False,
                     )
-
                     results = {}
                     for item in use_rounds:
-                        results_i = np.zeros(len(use_rounds[item]["code_name"]))
-                        for i, round_i in enumerate(use_rounds[item]["code_name"]):
-                            # Don't round up to avoid conflicts where score is different to that input
-                            results_i[i] = hc_eq.score_for_round(
-                                all_rounds_objs[round_i],
-                                hc_from_score,
-                                "AGB",
-                                hc_params,
-                                round_score_up=False,
-                            )[0]
                         results[item] = dict(
-                            zip(use_rounds[item]["round_name"], results_i)
+                            zip(use_rounds[item]["round_name"], group_scores[item])
                         )
 
                     # Return the results
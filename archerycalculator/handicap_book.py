@@ -0,0 +1,174 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import click
+from flask import current_app
+
+from archerycalculator import hc_lookup, registry, tables, utils
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
+
+# Shard name for rounds that have not been allocated a family
+OTHER_FAMILY = "other"
+
+
+def family_codenames():
+    """
+    Group every round in the registry by family.
+
+    Returns
+    -------
+    families : dict of str: list of str
+        family names mapped to the codenames of their rounds, in registry order
+
+    References
+    ----------
+    """
+    families = {}
+    for codename, round_obj in registry.get_rounds().items():
+        families.setdefault(round_obj.family or OTHER_FAMILY, []).append(codename)
+    return families
+
+
+def book_handicaps(scheme, hc_step=1.0):
+    """
+    Handicaps tabulated in the book for a scheme.
+
+    Covers the same range as the handicap lookup tables, see hc_lookup.HC_RANGES,
+    spaced as on the handicap tables page.
+
+    Parameters
+    ----------
+    scheme : str
+        handicap scheme
+    hc_step : float
+        spacing between handicaps
+
+    Returns
+    -------
+    handicaps : np.ndarray
+        raises ValueError if hc_step does not give a valid range
+
+    References
+    ----------
+    """
+    hc_min, hc_max = hc_lookup.HC_RANGES[scheme]
+    handicaps, error = tables.handicap_range(hc_min, hc_max, hc_step)
+    if error is not None:
+        raise ValueError(error)
+    return handicaps
+
+
+def _build_shard(family, codenames, schemes, hc_step, filename):
+    rounds = registry.get_rounds()
+    hc_params = hc_eq.HcParams()
+    arrays = {
+        "codenames": np.asarray(codenames),
+        "names": np.asarray([rounds[codename].name for codename in codenames]),
+    }
+    for scheme in schemes:
+        handicaps = book_handicaps(scheme, hc_step)
+        scores = np.zeros([len(handicaps), len(codenames)], dtype=np.int32)
+        for i, codename in enumerate(codenames):
+            # As calculated for tables.handicap_tables
+            scores[:, i] = hc_eq.score_for_round(
+                rounds[codename], handicaps, scheme, hc_params
+            )[0].astype(np.int32)
+        arrays[f"{scheme}_handicaps"] = handicaps
+        arrays[f"{scheme}_scores"] = scores
+
+    utils.save_npz(filename, arrays, compressed=True)
+    return family, len(codenames)
+
+
+def build_book(directory, schemes=None, hc_step=1.0, processes=1):
+    """
+    Tabulate the score for every handicap on every round, one file per family.
+
+    Each family is written to '<family>.npz' in directory, holding the round
+    'codenames' and 'names' and, for each scheme, '<scheme>_handicaps' and
+    '<scheme>_scores' with one row per handicap and one column per round.
+
+    Parameters
+    ----------
+    directory : str
+        directory to write the shards to
+    schemes : list of str
+        handicap schemes to tabulate, defaults to all in hc_lookup.HC_RANGES
+    hc_step : float
+        spacing between handicaps
+    processes : int
+        worker processes to build the shards in, 1 to build in this process
+
+    Returns
+    -------
+    shards : dict of str: int
+        families written mapped to the number of rounds in each
+
+    References
+    ----------
+    """
+    if schemes is None:
+        schemes = list(hc_lookup.HC_RANGES)
+    # Check the step before starting any workers
+    for scheme in schemes:
+        book_handicaps(scheme, hc_step)
+    os.makedirs(directory, exist_ok=True)
+
+    families = family_codenames()
+    n_families = len(families)
+    args = (
+        list(families),
+        list(families.values()),
+        [schemes] * n_families,
+        [hc_step] * n_families,
+        [os.path.join(directory, f"{family}.npz") for family in families],
+    )
+
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            return dict(executor.map(_build_shard, *args))
+    return dict(map(_build_shard, *args))
+
+
+# define command line argument 'build-handicap-book' to tabulate every round
+@click.command("build-handicap-book")
+@click.option(
+    "--scheme",
+    "schemes",
+    multiple=True,
+    type=click.Choice(list(hc_lookup.HC_RANGES)),
+    help="Scheme to tabulate, repeat for more. All schemes by default.",
+)
+@click.option(
+    "--hc-step", default=1.0, show_default=True, help="Spacing between handicaps."
+)
+@click.option(
+    "--processes",
+    default=os.cpu_count(),
+    show_default=True,
+    help="Worker processes to build the families in.",
+)
+def build_handicap_book_command(schemes, hc_step, processes):
+    """Tabulate scores for every handicap, round and scheme by round family."""
+    try:
+        shards = build_book(
+            current_app.config["HANDICAP_BOOK_DIR"],
+            schemes=list(schemes) or None,
+            hc_step=hc_step,
+            processes=processes,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--hc-step")
+    click.echo(
+        f"Built handicap book for {sum(shards.values())} rounds "
+        f"in {len(shards)} families."
+    )
+
+
+def init_app(app):
+    # add build_handicap_book_command to be called from flask app
+    app.cli.add_command(build_handicap_book_command)
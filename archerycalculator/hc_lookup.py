@@ -0,0 +1,327 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+import click
+from flask import current_app, has_app_context
+
+from archerycalculator import registry, timing, utils
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
+hc_func = lazy_import("archeryutils.handicaps.handicap_functions")
+
+# Bracket of handicaps covered by the tables for each scheme
+HC_RANGES = {
+    "AGB": (-75.0, 300.0),
+    "AGBold": (-75.0, 300.0),
+    "AA": (-250.0, 175.0),
+    "AA2": (-250.0, 175.0),
+}
+# Number of points per handicap in the decimal table
+DECIMAL_STEPS = 10
+# Bump if the layout of the stored tables changes
+TABLE_VERSION = 1
+# Tables held in memory at once, most recently used kept
+MAX_TABLES = 512
+
+_tables = OrderedDict()
+# Guards _tables, which is shared between request threads
+_tables_lock = threading.Lock()
+
+
+def _default_cache_dir():
+    # Use the app config if we are inside one, otherwise keep tables in memory only
+    if has_app_context():
+        return current_app.config.get("HC_LOOKUP_DIR")
+    return None
+
+
+def _table_key(round_obj, scheme, diameter, hc_params):
+    """
+    Hash everything a table depends on so that changes to the round definition
+    or handicap parameters invalidate stored tables.
+    """
+    passes = [
+        (p.n_arrows, p.diameter, p.scoring_system, p.distance, p.indoor)
+        for p in round_obj.passes
+    ]
+    params = sorted(vars(hc_params).items())
+    fingerprint = repr((TABLE_VERSION, DECIMAL_STEPS, scheme, diameter, passes, params))
+    return hashlib.sha1(fingerprint.encode("utf8")).hexdigest()
+
+
+def _build_table(round_obj, scheme, diameter, hc_params):
+    hc_min, hc_max = HC_RANGES[scheme]
+    int_handicaps = np.arange(hc_min, hc_max + 1.0)
+    dec_handicaps = hc_min + np.arange(
+        int((hc_max - hc_min) * DECIMAL_STEPS) + 1
+    ) / float(DECIMAL_STEPS)
+
+    int_scores = hc_eq.score_for_round(
+        round_obj, int_handicaps, scheme, hc_params, arw_d=diameter
+    )[0]
+    dec_scores = hc_eq.score_for_round(
+        round_obj,
+        dec_handicaps,
+        scheme,
+        hc_params,
+        arw_d=diameter,
+        round_score_up=False,
+    )[0]
+
+    return {
+        "int_handicaps": int_handicaps,
+        "int_scores": np.asarray(int_scores, dtype=float),
+        "dec_handicaps": dec_handicaps,
+        "dec_scores": np.asarray(dec_scores, dtype=float),
+    }
+
+
+@timing.timed("handicap")
+def get_table(codename, scheme, diameter=None, hc_params=None, cache_dir=None):
+    """
+    Get the score lookup table for a round, building it if required.
+
+    Tables are held in memory and, for the default arrow diameter, stored in
+    cache_dir so they survive restarts.
+
+    Parameters
+    ----------
+    codename : str
+        codename of the round in the registry
+    scheme : str
+        handicap scheme to use
+    diameter : float or None
+        arrow diameter in metres, None for the scheme default
+    hc_params : handicap_equations.HcParams
+        handicap parameters, default parameters if not provided
+    cache_dir : str
+        directory to store tables in, defaults to app config 'HC_LOOKUP_DIR'
+
+    Returns
+    -------
+    table : dict of str: np.ndarray
+        integer handicaps and rounded scores, and decimal handicaps and
+        unrounded scores
+
+    References
+    ----------
+    """
+    if hc_params is None:
+        hc_params = hc_eq.HcParams()
+    if cache_dir is None:
+        cache_dir = _default_cache_dir()
+
+    round_obj = registry.get_round(codename)
+    key = _table_key(round_obj, scheme, diameter, hc_params)
+
+    with _tables_lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+            return _tables[key]
+
+    # Custom diameters can take any value so are not persisted
+    table_path = None
+    if cache_dir is not None and diameter is None:
+        table_path = os.path.join(cache_dir, f"{codename}_{scheme}_{key[:16]}.npz")
+
+    if table_path is not None and os.path.exists(table_path):
+        with np.load(table_path) as stored:
+            table = {k: stored[k] for k in stored.files}
+    else:
+        table = _build_table(round_obj, scheme, diameter, hc_params)
+        if table_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            utils.save_npz(table_path, table)
+
+    with _tables_lock:
+        _tables[key] = table
+        _tables.move_to_end(key)
+        if len(_tables) > MAX_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def _int_lookup(table, scores, scheme):
+    """
+    Integer handicaps from the rounded score table.
+
+    Matches handicap_functions.handicap_from_score: where a score appears in the
+    table take the worst handicap giving it, otherwise the best handicap with a
+    lower score. Returns NaN where the table does not cover the score.
+    """
+    int_scores = table["int_scores"]
+    n_hc = len(int_scores)
+    if scheme in ("AA", "AA2"):
+        # Scores increase with handicap
+        lo = np.searchsorted(int_scores, scores, side="left")
+        hi = np.searchsorted(int_scores, scores, side="right")
+        idx = lo - 1 + (hi > lo)
+    else:
+        # Scores decrease with handicap, search the reversed table
+        lo = np.searchsorted(int_scores[::-1], scores, side="left")
+        hi = np.searchsorted(int_scores[::-1], scores, side="right")
+        idx = n_hc - lo - (hi > lo)
+
+    # Scores beyond either end of the table, or tied with its last entry, may
+    # belong to handicaps outside it
+    valid = (lo > 0) & (lo < n_hc)
+    return np.where(valid, table["int_handicaps"][np.clip(idx, 0, n_hc - 1)], np.nan)
+
+
+def _decimal_lookup(table, scores, round_obj, scheme, diameter, hc_params):
+    """
+    Decimal handicaps by interpolating the table then taking one secant step
+    against the exact score. Returns NaN where the table does not cover the score.
+    """
+    dec_scores = table["dec_scores"]
+    dec_handicaps = table["dec_handicaps"]
+    if scheme not in ("AA", "AA2"):
+        dec_scores = dec_scores[::-1]
+        dec_handicaps = dec_handicaps[::-1]
+
+    j = np.clip(np.searchsorted(dec_scores, scores), 1, len(dec_scores) - 1)
+    d_score = dec_scores[j] - dec_scores[j - 1]
+    valid = (scores >= dec_scores[0]) & (scores <= dec_scores[-1]) & (d_score > 0)
+
+    slope = np.where(valid, d_score, 1.0) / (dec_handicaps[j] - dec_handicaps[j - 1])
+    hc_guess = dec_handicaps[j - 1] + (scores - dec_scores[j - 1]) / slope
+    score_guess = hc_eq.score_for_round(
+        round_obj,
+        hc_guess,
+        scheme,
+        hc_params,
+        arw_d=diameter,
+        round_score_up=False,
+    )[0]
+    hc_refined = hc_guess + (scores - score_guess) / slope
+
+    return np.where(valid, hc_refined, np.nan)
+
+
+@timing.timed("handicap")
+def handicap_from_score(
+    scores,
+    codename,
+    scheme,
+    diameter=None,
+    int_prec=True,
+    hc_params=None,
+    cache_dir=None,
+):
+    """
+    Get handicaps for one or more scores on a round from the lookup tables.
+
+    Scores that fall outside the tables (e.g. a maximum score), and scores
+    with a custom arrow diameter, are passed to
+    handicap_functions.handicap_from_score.
+
+    Parameters
+    ----------
+    scores : float or array of float
+        scores to find handicaps for
+    codename : str
+        codename of the round in the registry
+    scheme : str
+        handicap scheme to use
+    diameter : float or None
+        arrow diameter in metres, None for the scheme default
+    int_prec : bool
+        return integer handicaps as in the official tables, else decimal
+    hc_params : handicap_equations.HcParams
+        handicap parameters, default parameters if not provided
+    cache_dir : str
+        directory to store tables in, defaults to app config 'HC_LOOKUP_DIR'
+
+    Returns
+    -------
+    handicaps : float or np.ndarray
+        handicap for each score, same shape as the input
+
+    References
+    ----------
+    """
+    if hc_params is None:
+        hc_params = hc_eq.HcParams()
+
+    scalar_input = np.ndim(scores) == 0
+    scores = np.atleast_1d(np.asarray(scores, dtype=float))
+
+    round_obj = registry.get_round(codename)
+    if diameter is not None:
+        # Custom diameters can take any value, so a table built for one is
+        # unlikely to be used again and would push out the default tables
+        handicaps = np.full(len(scores), np.nan)
+    else:
+        table = get_table(codename, scheme, None, hc_params, cache_dir)
+        if int_prec:
+            handicaps = _int_lookup(table, scores, scheme)
+        else:
+            handicaps = _decimal_lookup(
+                table, scores, round_obj, scheme, None, hc_params
+            )
+
+    for i in np.flatnonzero(np.isnan(handicaps)):
+        handicaps[i] = hc_func.handicap_from_score(
+            scores[i],
+            round_obj,
+            scheme,
+            hc_params,
+            arw_d=diameter,
+            int_prec=int_prec,
+        )
+
+    if scalar_input:
+        return float(handicaps[0])
+    return handicaps
+
+
+def build_tables(cache_dir, schemes=None, codenames=None):
+    """
+    Build and store lookup tables for many rounds up front.
+
+    Parameters
+    ----------
+    cache_dir : str
+        directory to store tables in
+    schemes : list of str
+        schemes to build tables for, defaults to all in HC_RANGES
+    codenames : list of str
+        rounds to build tables for, defaults to every round in the registry
+
+    Returns
+    -------
+    n_tables : int
+        number of tables built or found in the cache
+
+    References
+    ----------
+    """
+    if schemes is None:
+        schemes = list(HC_RANGES)
+    if codenames is None:
+        codenames = list(registry.get_rounds())
+
+    n_tables = 0
+    for codename in codenames:
+        for scheme in schemes:
+            get_table(codename, scheme, cache_dir=cache_dir)
+            n_tables += 1
+    return n_tables
+
+
+# define command line argument 'build-hc-lookup' to prebuild the stored tables
+@click.command("build-hc-lookup")
+def build_hc_lookup_command():
+    """Build score lookup tables for every round and handicap scheme."""
+    n_tables = build_tables(current_app.config["HC_LOOKUP_DIR"])
+    click.echo(f"Built {n_tables} handicap lookup tables.")
+
+
+def init_app(app):
+    # add build_hc_lookup_command to be called from flask app
+    app.cli.add_command(build_hc_lookup_command)
@@ -0,0 +1,176 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+
+# Rows of a handicap table formatted at once when given as an iterator
+CHUNK_SIZE = 100
+
+
+def _header(table_class, headings):
+    cells = "".join(f"<th>{escape(heading)}</th>" for heading in headings)
+    return (
+        f'<table class="{table_class}">\n<thead>\n<tr>{cells}</tr>\n</thead>\n<tbody>\n'
+    )
+
+
+_FOOTER = "</tbody>\n</table>\n"
+
+
+def _handicap_rows(results, hc_decimals):
+    # Scores are truncated to integers as by the int filter, blanks left empty
+    results = np.asarray(results, dtype=float).reshape(len(results), -1)
+    scores = np.where(results[:, 1:] == -9999, "", results[:, 1:].astype(np.int64))
+    return "".join(
+        "<tr><td>"
+        + "</td><td>".join([f"{handicap:0.{hc_decimals}f}"] + row)
+        + "</td></tr>\n"
+        for handicap, row in zip(results[:, 0].tolist(), scores.tolist())
+    )
+
+
+def handicap_table_chunks(roundnames, results, hc_decimals=0):
+    """
+    HTML for a handicap table in pieces, for streaming long tables.
+
+    Parameters
+    ----------
+    roundnames : list of str
+        names of the rounds, one column each
+    results : np.ndarray or iterable of list
+        rows of handicap followed by the score on each round, -9999 for blanks
+    hc_decimals : int
+        decimal places to show handicaps to
+
+    Yields
+    ------
+    html : markupsafe.Markup
+        the table opening, groups of rows, then the table closing
+
+    References
+    ----------
+    """
+    yield Markup(_header("hctable", ["Handicap"] + list(roundnames)))
+    if isinstance(results, np.ndarray):
+        yield Markup(_handicap_rows(results, hc_decimals))
+    else:
+        chunk = []
+        for row in results:
+            chunk.append(row)
+            if len(chunk) == CHUNK_SIZE:
+                yield Markup(_handicap_rows(chunk, hc_decimals))
+                chunk = []
+        if chunk:
+            yield Markup(_handicap_rows(chunk, hc_decimals))
+    yield Markup(_FOOTER)
+
+
+def handicap_table(roundnames, results, hc_decimals=0):
+    """
+    HTML for a handicap table, as rendered by render_handicap_table.
+
+    Parameters
+    ----------
+    roundnames : list of str
+        names of the rounds, one column each
+    results : np.ndarray or iterable of list
+        rows of handicap followed by the score on each round, -9999 for blanks
+    hc_decimals : int
+        decimal places to show handicaps to
+
+    Returns
+    -------
+    html : markupsafe.Markup
+
+    References
+    ----------
+    """
+    return Markup("".join(handicap_table_chunks(roundnames, results, hc_decimals)))
+
+
+def _text_row(cells):
+    return (
+        "<tr><td>"
+        + "</td><td>".join(
+            "" if cell == "-9999" else str(escape(cell)) for cell in cells
+        )
+        + "</td></tr>\n"
+    )
+
+
+def classification_table(classes, results):
+    """
+    HTML for a classification table, as rendered by render_classification_table.
+
+    Parameters
+    ----------
+    classes : list of str
+        class names for the column headings
+    results : np.ndarray of str
+        rows of round name followed by the score for each class, '-9999' for
+        blanks
+
+    Returns
+    -------
+    html : markupsafe.Markup
+
+    References
+    ----------
+    """
+    rows = "".join(_text_row(row) for row in np.asarray(results).tolist())
+    return Markup(_header("classtable", ["Round"] + list(classes)) + rows + _FOOTER)
+
+
+def event_table(classes, results):
+    """
+    HTML for a table of classifications by event, as rendered by render_event_table.
+
+    Parameters
+    ----------
+    classes : list of str
+        class names for the column headings
+    results : dict of str: list of str
+        category mapped to the round name and score for each class, '-9999'
+        for blanks
+
+    Returns
+    -------
+    html : markupsafe.Markup
+
+    References
+    ----------
+    """
+    rows = "".join(
+        _text_row([category] + list(row)) for category, row in results.items()
+    )
+    return Markup(
+        _header("eventtable", ["Category", "Round"] + list(classes)) + rows + _FOOTER
+    )
+
+
+def init_app(app):
+    """
+    Make the table functions available to templates and cache compiled templates.
+
+    Compiled templates are kept in TEMPLATE_CACHE_DIR, if set, so that new
+    worker processes do not have to compile them again.
+
+    References
+    ----------
+    """
+    app.jinja_env.globals.update(
+        handicap_table=handicap_table,
+        handicap_table_chunks=handicap_table_chunks,
+        classification_table=classification_table,
+        event_table=event_table,
+    )
+
+    cache_dir = app.config.get("TEMPLATE_CACHE_DIR")
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
@@ -0,0 +1,75 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when first used.
+
+    After the first attribute access the module's namespace is copied onto the
+    stand-in, so later lookups cost the same as on the module itself. Methods
+    are called through the class as the module may have attributes with the
+    same names (e.g. numpy.load).
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+        self.__lock = threading.Lock()
+
+    def _load(self):
+        if self.__module is None:
+            with self.__lock:
+                if self.__module is None:
+                    module = importlib.import_module(self.__name)
+                    self.__dict__.update(module.__dict__)
+                    self.__module = module
+        return self.__module
+
+    def _is_loaded(self):
+        return self.__module is not None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not yet copied from the module
+        return getattr(LazyModule._load(self), attr)
+
+    def __repr__(self):
+        state = "loaded" if LazyModule._is_loaded(self) else "not loaded"
+        return f"<lazy module '{self.__name}' ({state})>"
+
+
+# One stand-in per module so each is only imported once
+_modules = {}
+
+
+def lazy_import(name):
+    """
+    Get a stand-in for a module that imports it on first use.
+
+    Parameters
+    ----------
+    name : str
+        full dotted name of the module
+
+    Returns
+    -------
+    module : LazyModule
+        object forwarding attribute access to the module
+
+    References
+    ----------
+    """
+    if name not in _modules:
+        _modules[name] = LazyModule(name)
+    return _modules[name]
+
+
+def load_all():
+    """Import every module requested through lazy_import so far."""
+    for module in list(_modules.values()):
+        LazyModule._load(module)
+
+
+def loaded():
+    """Names of the modules requested through lazy_import that are imported."""
+    return [name for name, module in _modules.items() if LazyModule._is_loaded(module)]
@@ -1,85 +1,187 @@
-from archeryutils import load_rounds
-from archeryutils.classifications import classifications as class_func
-
-
-bowstyles = class_func.read_bowstyles_json()
-
-genders = class_func.read_genders_json()
-
-ages = class_func.read_ages_json()
+from archerycalculator import registry
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+class_func = lazy_import("archeryutils.classifications.classifications")
+
+# Columns filled for each table, tables in the order they are loaded
+COLUMNS = {
+    "bowstyles": ("bowstyle", "disciplines"),
+    "ages": ("age_group", "gov_body", "male_dist", "female_dist"),
+    "genders": ("gender",),
+    "rounds": (
+        "round_name",
+        "code_name",
+        "body",
+        "location",
+        "family",
+        "compound_code_name",
+        "max_score",
+        "max_distance",
+        "display_order",
+    ),
+    "classes": ("shortname", "longname"),
+}
+
+
+def bowstyle_rows():
+    # AGB Target bowstyles from file
+    rows = [(item["bowstyle"], "TF") for item in class_func.read_bowstyles_json()]
+    # Additional AGB field bowstyles
+    rows += [(item, "TF") for item in ["Traditional", "Flatbow"]]
+    return rows
 
-classes = class_func.read_classes_json()
 
-rounds = load_rounds.read_json_to_round_dict(
-    [
-        "AGB_outdoor_imperial.json",
-        "AGB_outdoor_metric.json",
-        "AGB_indoor.json",
-        "WA_outdoor.json",
-        "WA_indoor.json",
-        "AGB_VI.json",
-        "WA_VI.json",
-        "WA_field.json",
-        "IFAA_field.json",
-        "Custom.json",
+def age_rows():
+    # Distances are stored as text
+    return [
+        (item["age_group"], "AGB", str(item["male"][0]), str(item["female"][0]))
+        for item in class_func.read_ages_json()
     ]
-)
 
 
-def load_bowstyles_to_db(db):
-    # AGB Target bowstyles from file
-    for item in bowstyles:
-        db.execute(
-            "INSERT INTO bowstyles (bowstyle,disciplines) VALUES (?,?);",
-            (item["bowstyle"], "TF"),
-        )
-    # Additional AGB field bowstyles
-    for item in ["Traditional", "Flatbow"]:
-        db.execute(
-            "INSERT INTO bowstyles (bowstyle,disciplines) VALUES (?,?);",
-            (item, "TF"),
-        )
-    db.commit()
+def gender_rows():
+    return [(item,) for item in class_func.read_genders_json()]
 
 
-def load_genders_to_db(db):
-    for item in genders:
-        db.execute("INSERT INTO genders (gender) VALUES (?);", [item])
-    db.commit()
+def round_rows():
+    # Imported here as utils depends on the database which uses this module
+    from archerycalculator import utils
 
+    rounds = registry.get_rounds()
 
-def load_ages_to_db(db):
-    for item in ages:
-        db.execute(
-            "INSERT INTO ages (age_group,gov_body,male_dist,female_dist) VALUES (?,?,?,?);",
-            (item["age_group"], "AGB", item["male"][0], item["female"][0]),
+    # Store the display order so that sorting is done by the database
+    display_order = {
+        codename: i
+        for i, codename in enumerate(
+            utils.order_rounds({item: rounds[item].family for item in rounds})
         )
-    db.commit()
-
-
-def load_rounds_to_db(db):
-    for item in rounds:
-        db.execute(
-            "INSERT INTO rounds (round_name,code_name,body,location,family) VALUES (?,?,?,?,?);",
-            (
-                rounds[item].name,
-                item,
-                rounds[item].body,
-                rounds[item].location,
-                rounds[item].family,
-            ),
+    }
+
+    return [
+        (
+            rounds[item].name,
+            item,
+            rounds[item].body,
+            rounds[item].location,
+            rounds[item].family,
+            utils.get_compound_codename(item),
+            float(rounds[item].max_score()),
+            float(rounds[item].max_distance()),
+            display_order[item],
         )
-    db.commit()
+        for item in rounds
+    ]
 
 
-def load_classes_to_db(db):
-    for i, shortname in enumerate(classes["classes"]):
-        db.execute(
-            "INSERT INTO classes (shortname,longname) VALUES (?,?);",
-            (shortname, classes["classes_long"][i]),
-        )
-    db.execute(
-        "INSERT INTO classes (shortname,longname) VALUES (?,?);",
-        ("UC", "Unclassified"),
-    )
-    db.commit()
+def class_rows():
+    classes = class_func.read_classes_json()
+    rows = list(zip(classes["classes"], classes["classes_long"]))
+    rows.append(("UC", "Unclassified"))
+    return rows
+
+
+# Functions giving the rows for each table, only called when the database is built
+ROWS = {
+    "bowstyles": bowstyle_rows,
+    "ages": age_rows,
+    "genders": gender_rows,
+    "rounds": round_rows,
+    "classes": class_rows,
+}
+
+
+def insert_rows(db, table, rows):
+    columns = ",".join(COLUMNS[table])
+    placeholders = ",".join("?" * len(COLUMNS[table]))
+    db.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders});", rows)
+
+
+def load_all(db):
+    """
+    Fill every table from the archeryutils data files.
+
+    Parameters
+    ----------
+    db : sqlite3.Connection
+        writable connection to a database with empty tables
+
+    References
+    ----------
+    """
+    for table, rows in ROWS.items():
+        insert_rows(db, table, rows())
+
+
+def has_current_schema(db):
+    """
+    Check that a database has every table and column the app expects.
+
+    Parameters
+    ----------
+    db : sqlite3.Connection
+        connection to the database
+
+    Returns
+    -------
+    bool
+        True if all tables in COLUMNS exist with all their columns
+
+    References
+    ----------
+    """
+    for table, columns in COLUMNS.items():
+        existing = [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+        if not set(columns).issubset(existing):
+            return False
+    return True
+
+
+def update_all(db):
+    """
+    Bring an existing database up to date with the archeryutils data files.
+
+    Rounds whose details have changed are updated in place and all others are
+    left alone. If rounds have been added, removed or reordered the rounds table
+    is refilled to keep the database order. The other tables are small so are
+    refilled whenever they differ.
+
+    Parameters
+    ----------
+    db : sqlite3.Connection
+        writable connection to a database with the current schema
+
+    Returns
+    -------
+    n_changed : dict of str: int
+        number of rows written to each table
+
+    References
+    ----------
+    """
+    n_changed = {}
+    for table, rows in ROWS.items():
+        columns = COLUMNS[table]
+        new_rows = [tuple(row) for row in rows()]
+        query = f"SELECT {','.join(columns)} FROM {table} ORDER BY id"
+        old_rows = [tuple(row) for row in db.execute(query)]
+
+        if table == "rounds" and [r[1] for r in old_rows] == [r[1] for r in new_rows]:
+            # Same rounds in the same order, so update changed rows by codename
+            updates = [
+                new_row[:1] + new_row[2:] + new_row[1:2]
+                for old_row, new_row in zip(old_rows, new_rows)
+                if old_row != new_row
+            ]
+            set_columns = ",".join(f"{c}=?" for c in columns[:1] + columns[2:])
+            db.executemany(
+                f"UPDATE rounds SET {set_columns} WHERE code_name=?;", updates
+            )
+            n_changed[table] = len(updates)
+        elif old_rows != new_rows:
+            db.execute(f"DELETE FROM {table};")
+            insert_rows(db, table, new_rows)
+            n_changed[table] = len(new_rows)
+        else:
+            n_changed[table] = 0
+    return n_changed
@@ -0,0 +1,124 @@
+from flask import current_app
+
+from archerycalculator import utils
+from archerycalculator.db import data_stamp, query_db, sql_to_dol
+
+# Reference data for each database with its data stamp, built on first use
+_cache = {}
+
+
+def _load_refdata():
+    bowstyles = sql_to_dol(query_db("SELECT bowstyle,disciplines FROM bowstyles"))
+    genders = sql_to_dol(query_db("SELECT gender FROM genders"))
+    ages = sql_to_dol(query_db("SELECT age_group,male_dist,female_dist FROM ages"))
+    classes = sql_to_dol(query_db("SELECT shortname,longname FROM classes"))
+    rounds = sql_to_dol(query_db("SELECT code_name,round_name FROM rounds ORDER BY id"))
+
+    refdata = {
+        "bowstyles": tuple(bowstyles["bowstyle"]),
+        "genders": tuple(genders["gender"]),
+        "ages": {key: tuple(value) for key, value in ages.items()},
+        "classes": tuple(classes["shortname"]),
+        "class_longnames": dict(zip(classes["shortname"], classes["longname"])),
+        "round_names": tuple(
+            utils.indoor_display_filter(
+                dict(zip(rounds["code_name"], rounds["round_name"]))
+            )
+        ),
+    }
+
+    # Prebuilt (value, label) pairs for form dropdowns, with and without a blank
+    refdata["choices"] = {}
+    for field, values in [
+        ("bowstyle", refdata["bowstyles"]),
+        ("gender", refdata["genders"]),
+        ("age", refdata["ages"]["age_group"]),
+        ("round", refdata["round_names"]),
+    ]:
+        pairs = tuple((value, value) for value in values)
+        refdata["choices"][(field, False)] = pairs
+        refdata["choices"][(field, True)] = (("", ""),) + pairs
+
+    return refdata
+
+
+def get_refdata():
+    """
+    Get the reference data for the current app's database.
+
+    Built from the database the first time it is requested and then reused
+    until the database's data_stamp() changes or invalidate() is called.
+
+    Returns
+    -------
+    refdata : dict
+        bowstyles, genders, ages, classes and round names from the database
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    stamp = data_stamp(database)
+    cached = _cache.get(database)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, _load_refdata())
+        _cache[database] = cached
+    return cached[1]
+
+
+def choices(field, blank=False):
+    """
+    Get prebuilt dropdown choices for a form field.
+
+    Parameters
+    ----------
+    field : str
+        one of 'bowstyle', 'gender', 'age' or 'round'
+    blank : bool
+        include an empty first choice
+
+    Returns
+    -------
+    choices : tuple of (str, str)
+        (value, label) pairs for a wtforms SelectField
+
+    References
+    ----------
+    """
+    return get_refdata()["choices"][(field, blank)]
+
+
+def round_choices(selected):
+    """
+    Get dropdown choices for a round field holding only the selected round.
+
+    The other rounds are found through the search API as the user types, so
+    only the current choice is sent with the page.
+
+    Parameters
+    ----------
+    selected : str or None
+        round name submitted in the form
+
+    Returns
+    -------
+    choices : tuple of (str, str)
+        a blank choice, followed by the selected round if it is a valid one
+
+    References
+    ----------
+    """
+    if selected and selected in get_refdata()["round_names"]:
+        return (("", ""), (selected, selected))
+    return (("", ""),)
+
+
+def preload(refdata):
+    """Use reference data for the current app's database loaded elsewhere."""
+    database = current_app.config["DATABASE"]
+    _cache[database] = (data_stamp(database), refdata)
+
+
+def invalidate():
+    """Drop cached reference data so it is rebuilt from the database."""
+    _cache.clear()
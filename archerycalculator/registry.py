@@ -0,0 +1,160 @@
+from functools import lru_cache
+from types import MappingProxyType
+
+from archerycalculator import timing
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+load_rounds = lazy_import("archeryutils.load_rounds")
+
+# Order matters - it sets the order rounds are inserted into the database
+ROUND_FILES = (
+    "AGB_outdoor_imperial.json",
+    "AGB_outdoor_metric.json",
+    "AGB_indoor.json",
+    "WA_outdoor.json",
+    "WA_indoor.json",
+    "AGB_VI.json",
+    "WA_VI.json",
+    "WA_field.json",
+    "IFAA_field.json",
+    "Custom.json",
+)
+
+
+# Rounds given by set_rounds(), used instead of reading the files
+_rounds = None
+
+
+@lru_cache(maxsize=None)
+def _read_rounds():
+    return MappingProxyType(load_rounds.read_json_to_round_dict(list(ROUND_FILES)))
+
+
+@timing.timed("rounds")
+def get_rounds():
+    """
+    Load every round known to the app, once per process.
+
+    Returns
+    -------
+    rounds : mappingproxy of str: archeryutils.Round
+        read-only mapping of round codenames to Round objects
+
+    References
+    ----------
+    """
+    if _rounds is not None:
+        return _rounds
+    return _read_rounds()
+
+
+def set_rounds(rounds):
+    """
+    Use rounds loaded elsewhere, e.g. from a snapshot, instead of the files.
+
+    Parameters
+    ----------
+    rounds : dict of str: archeryutils.Round
+        round codenames mapped to Round objects
+
+    References
+    ----------
+    """
+    global _rounds
+    _rounds = MappingProxyType(dict(rounds))
+    _codenames_by_name.cache_clear()
+
+
+def reset_rounds():
+    """Go back to the rounds read from the files after set_rounds()."""
+    global _rounds
+    _rounds = None
+    _codenames_by_name.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _codenames_by_name():
+    # First codename wins for duplicated names, as for the database queries
+    codenames = {}
+    for codename, round_obj in get_rounds().items():
+        codenames.setdefault(round_obj.name, codename)
+    return MappingProxyType(codenames)
+
+
+def get_codename(round_name, compound=False):
+    """
+    Get the codename for a round from its display name.
+
+    Parameters
+    ----------
+    round_name : str
+        display name of the round as shown in the dropdowns
+    compound : bool
+        return the compound scoring variant of the round if there is one
+
+    Returns
+    -------
+    codename : str or None
+        codename of the round, or None if the name is not recognised
+
+    References
+    ----------
+    """
+    # Imported here as utils depends on the database which uses this module
+    from archerycalculator.utils import get_compound_codename
+
+    codename = _codenames_by_name().get(round_name)
+    if codename is not None and compound:
+        codename = get_compound_codename(codename)
+    return codename
+
+
+def get_round(codename, compound=False):
+    """
+    Get a round from the registry by codename.
+
+    Parameters
+    ----------
+    codename : str
+        archeryutils codename of the round
+    compound : bool
+        return the compound scoring variant of the round if there is one
+
+    Returns
+    -------
+    round_obj : archeryutils.Round
+
+    References
+    ----------
+    """
+    from archerycalculator.utils import get_compound_codename
+
+    if compound:
+        codename = get_compound_codename(codename)
+    return get_rounds()[codename]
+
+
+def get_round_by_name(round_name, compound=False):
+    """
+    Get a round from the registry by its display name.
+
+    Parameters
+    ----------
+    round_name : str
+        display name of the round as shown in the dropdowns
+    compound : bool
+        return the compound scoring variant of the round if there is one
+
+    Returns
+    -------
+    round_obj : archeryutils.Round or None
+        Round object, or None if the name is not recognised
+
+    References
+    ----------
+    """
+    codename = get_codename(round_name, compound=compound)
+    if codename is None:
+        return None
+    return get_rounds()[codename]
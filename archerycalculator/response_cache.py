@@ -0,0 +1,276 @@
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from flask import Response, current_app, request
+
+from archerycalculator.db import data_stamp
+
+# Headers that are stored with a cached response
+STORED_HEADERS = ["Content-Type"]
+
+
+class MemoryBackend:
+    """LRU cache of responses held in this process."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskBackend:
+    """
+    LRU cache of responses in an SQLite file, shared by every worker process
+    using the same file.
+    """
+
+    def __init__(self, filename, max_entries, ttl):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+        self.evictions = 0
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    def _connect(self):
+        # Opened on first use, one per thread and process, as sqlite3
+        # connections must not be shared, including with workers forked after
+        # the app was created
+        pooled = getattr(self.local, "db", None)
+        if pooled is None or pooled[1] != os.getpid():
+            db = sqlite3.connect(self.filename, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, expires REAL, accessed REAL, value BLOB)"
+                )
+            pooled = (db, os.getpid())
+            self.local.db = pooled
+        return pooled[0]
+
+    def get(self, key):
+        db = self._connect()
+        row = db.execute(
+            "SELECT expires,value FROM responses WHERE key = ?", [key]
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        with db:
+            if row[0] < now:
+                db.execute("DELETE FROM responses WHERE key = ?", [key])
+                return None
+            db.execute("UPDATE responses SET accessed = ? WHERE key = ?", [now, key])
+        return pickle.loads(row[1])
+
+    def set(self, key, value):
+        db = self._connect()
+        now = time.time()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key,expires,accessed,value) "
+                "VALUES (?,?,?,?)",
+                [key, now + self.ttl, now, pickle.dumps(value)],
+            )
+            n_entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if n_entries > self.max_entries:
+                n_evict = n_entries - self.max_entries
+                db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    [n_evict],
+                )
+                self.evictions += n_evict
+
+    def clear(self):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM responses")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Response cache for an app with hit and miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": self.backend.evictions,
+            "entries": len(self.backend),
+        }
+
+    def prometheus_lines(self):
+        lines = []
+        for name, value in self.stats().items():
+            kind = "gauge" if name == "entries" else "counter"
+            suffix = "" if kind == "gauge" else "_total"
+            lines += [
+                f"# TYPE archerycalculator_response_cache_{name}{suffix} {kind}",
+                f"archerycalculator_response_cache_{name}{suffix} {value}",
+            ]
+        return lines
+
+
+def _normalise(items):
+    # Ignore the order of fields but keep their values exactly as submitted,
+    # as the views validate the raw values
+    return sorted(items, key=lambda item: item[0])
+
+
+def cache_key():
+    """
+    Key for the current request from its endpoint and submitted inputs.
+
+    Returns
+    -------
+    key : str
+        hash of the database and its data stamp, endpoint, method, query
+        arguments and form fields
+
+    References
+    ----------
+    """
+    fingerprint = repr(
+        (
+            current_app.config["DATABASE"],
+            # Responses from before the database was last written are not reused
+            data_stamp(),
+            request.endpoint,
+            request.method,
+            _normalise(request.args.items(multi=True)),
+            _normalise(request.form.items(multi=True)),
+        )
+    )
+    return hashlib.sha1(fingerprint.encode("utf8")).hexdigest()
+
+
+def cached(view):
+    """
+    Serve repeated requests to a view from the app's response cache.
+
+    Only for views whose output depends only on their inputs and the
+    reference data. Successful responses are stored, anything else, and
+    streamed responses, are always passed through.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get("response_cache")
+        if cache is None:
+            return view(*args, **kwargs)
+
+        key = cache_key()
+        stored = cache.backend.get(key)
+        if stored is not None:
+            cache.count(hit=True)
+            status, headers, body = stored
+            response = Response(body, status=status, headers=headers)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        cache.count(hit=False)
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            headers = {k: response.headers[k] for k in STORED_HEADERS}
+            cache.backend.set(key, (response.status_code, headers, response.get_data()))
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def invalidate(app=None):
+    """Empty the response cache, e.g. once the database is rebuilt."""
+    if app is None:
+        app = current_app
+    cache = app.extensions.get("response_cache")
+    if cache is not None:
+        cache.backend.clear()
+
+
+def init_app(app):
+    """
+    Set up the response cache chosen by RESPONSE_CACHE in the app config.
+
+    'memory' keeps responses in each process, 'disk' shares them between
+    processes through RESPONSE_CACHE_FILE, and None disables caching. The
+    cache holds at most RESPONSE_CACHE_SIZE responses, each for at most
+    RESPONSE_CACHE_TTL seconds.
+
+    References
+    ----------
+    """
+    backend_name = app.config.get("RESPONSE_CACHE")
+    max_entries = app.config["RESPONSE_CACHE_SIZE"]
+    ttl = app.config["RESPONSE_CACHE_TTL"]
+    if backend_name is None:
+        return
+    elif backend_name == "memory":
+        backend = MemoryBackend(max_entries, ttl)
+    elif backend_name == "disk":
+        backend = DiskBackend(app.config["RESPONSE_CACHE_FILE"], max_entries, ttl)
+    else:
+        raise ValueError(
+            f"Unknown RESPONSE_CACHE '{backend_name}', use 'memory', 'disk' or None."
+        )
+
+    cache = ResponseCache(backend)
+    app.extensions["response_cache"] = cache
+
+    # Report the counters alongside the request timings if they are enabled
+    if "timing" in app.extensions:
+        app.extensions["timing"].collectors.append(cache.prometheus_lines)
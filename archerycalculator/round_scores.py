@@ -0,0 +1,144 @@
+from functools import lru_cache
+
+from archerycalculator import registry, timing
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
+
+
+def _target_key(pass_i):
+    return (pass_i.diameter, pass_i.scoring_system, pass_i.distance, pass_i.indoor)
+
+
+@lru_cache(maxsize=64)
+def pack_rounds(codenames):
+    """
+    Pack the passes of many rounds into arrays for batched scoring.
+
+    Passes shot at the same target face and distance are shared between rounds,
+    so each distinct target only has to be scored once per handicap.
+
+    Parameters
+    ----------
+    codenames : tuple of str
+        codenames of the rounds in the registry
+
+    Returns
+    -------
+    packed : dict
+        'codenames' as given, 'targets' with one archeryutils Target per distinct
+        target and 'arrows', an array of the number of arrows each round shoots
+        at each target indexed by [round, target]
+
+    References
+    ----------
+    """
+    all_rounds_objs = registry.get_rounds()
+
+    targets = {}
+    arrows = []
+    for codename in codenames:
+        arrows_i = {}
+        for pass_i in all_rounds_objs[codename].passes:
+            key = _target_key(pass_i)
+            targets.setdefault(key, pass_i.target)
+            arrows_i[key] = arrows_i.get(key, 0) + pass_i.n_arrows
+        arrows.append(arrows_i)
+
+    arrow_counts = np.zeros([len(codenames), len(targets)])
+    for i, arrows_i in enumerate(arrows):
+        for j, key in enumerate(targets):
+            arrow_counts[i, j] = arrows_i.get(key, 0)
+
+    return {
+        "codenames": codenames,
+        "targets": tuple(targets.values()),
+        "arrows": arrow_counts,
+    }
+
+
+@timing.timed("handicap")
+def scores_for_rounds(codenames, handicap, scheme, hc_params=None, arw_d=None):
+    """
+    Expected scores on many rounds for a handicap.
+
+    Equivalent to handicap_equations.score_for_round with round_score_up=False
+    for each round, but each distinct target is scored once and the round totals
+    formed in a single matrix product.
+
+    Parameters
+    ----------
+    codenames : list of str
+        codenames of the rounds in the registry
+    handicap : float or np.ndarray
+        handicap(s) to calculate scores for
+    scheme : str
+        handicap scheme to use
+    hc_params : handicap_equations.HcParams
+        handicap parameters, default parameters if not provided
+    arw_d : float or None
+        arrow diameter in metres, None for the scheme default
+
+    Returns
+    -------
+    scores : np.ndarray
+        unrounded expected score on each round, with a trailing axis for the
+        handicaps if an array was given
+
+    References
+    ----------
+    """
+    if hc_params is None:
+        hc_params = hc_eq.HcParams()
+
+    packed = pack_rounds(tuple(codenames))
+    target_scores = np.asarray(
+        [
+            hc_eq.arrow_score(target, handicap, scheme, hc_params, arw_d=arw_d)
+            for target in packed["targets"]
+        ],
+        dtype=float,
+    ).reshape(len(packed["targets"]), -1)
+
+    scores = packed["arrows"] @ target_scores
+    if np.ndim(handicap) == 0:
+        return scores[:, 0]
+    return scores.reshape((len(codenames),) + np.shape(handicap))
+
+
+def grouped_scores_for_rounds(groups, handicap, scheme, hc_params=None, arw_d=None):
+    """
+    Expected scores for groups of rounds in one batch.
+
+    Parameters
+    ----------
+    groups : dict of str: list of str
+        group names mapped to the codenames of the rounds in them
+    handicap : float
+        handicap to calculate scores for
+    scheme : str
+        handicap scheme to use
+    hc_params : handicap_equations.HcParams
+        handicap parameters, default parameters if not provided
+    arw_d : float or None
+        arrow diameter in metres, None for the scheme default
+
+    Returns
+    -------
+    scores : dict of str: np.ndarray
+        group names mapped to the unrounded score on each of their rounds
+
+    References
+    ----------
+    """
+    codenames = [codename for group in groups.values() for codename in group]
+    scores = scores_for_rounds(codenames, handicap, scheme, hc_params, arw_d)
+
+    results = {}
+    start = 0
+    for name, group in groups.items():
+        results[name] = scores[start : start + len(group)]
+        start += len(group)
+    return results
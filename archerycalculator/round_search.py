@@ -0,0 +1,151 @@
+from bisect import bisect_left
+from collections import Counter
+import re
+
+from flask import current_app
+
+from archerycalculator import refdata, registry
+from archerycalculator.db import data_stamp
+
+# Results returned per page of a search
+PAGE_SIZE = 30
+# Fraction of the query's trigrams a round must share to be a fuzzy match
+FUZZY_THRESHOLD = 0.4
+
+# Search indexes for each database with its data stamp, built on first use
+_indexes = {}
+
+
+def _normalise(text):
+    # Lowercase words separated by single spaces, ignoring punctuation
+    return " ".join(re.split(r"[^0-9a-z]+", text.lower())).strip()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _build_index():
+    names = refdata.get_refdata()["round_names"]
+    texts = []
+    tokens = []
+    trigrams = {}
+    for i, name in enumerate(names):
+        text = _normalise(name)
+        codename = _normalise(registry.get_codename(name) or "")
+        texts.append(text)
+        for token in set(text.split() + codename.split()):
+            tokens.append((token, i))
+        for trigram in _trigrams(text) | _trigrams(codename):
+            trigrams.setdefault(trigram, set()).add(i)
+    return {
+        "names": names,
+        "texts": texts,
+        "tokens": sorted(tokens),
+        "trigrams": trigrams,
+    }
+
+
+def get_index():
+    """
+    Get the round search index for the current app's database.
+
+    The index covers the round names shown in the dropdowns and their
+    codenames, with a sorted list of words for prefix matching and the rounds
+    containing each trigram for fuzzy matching.
+
+    Returns
+    -------
+    index : dict
+        'names' and normalised 'texts' of the rounds, sorted (word, round)
+        'tokens' and a mapping from 'trigrams' to the rounds containing them
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    stamp = data_stamp(database)
+    cached = _indexes.get(database)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, _build_index())
+        _indexes[database] = cached
+    return cached[1]
+
+
+def _prefix_matches(index, word):
+    tokens = index["tokens"]
+    matches = set()
+    i = bisect_left(tokens, (word,))
+    while i < len(tokens) and tokens[i][0].startswith(word):
+        matches.add(tokens[i][1])
+        i += 1
+    return matches
+
+
+def search(query, page=1, page_size=PAGE_SIZE):
+    """
+    Find rounds matching a search, in the format used by Select2.
+
+    Rounds where every word of the query starts a word of the round name or
+    codename come first, those whose name starts with the query ahead of the
+    rest. These are followed by rounds with similar names, so that typos still
+    find a match. An empty query gives every round.
+
+    Parameters
+    ----------
+    query : str
+        text typed by the user
+    page : int
+        page of results to return, starting from 1
+    page_size : int
+        number of results per page
+
+    Returns
+    -------
+    results : dict
+        'results' with the 'id' and 'text' of each round on the page and
+        'pagination' saying if there are 'more' pages
+
+    References
+    ----------
+    """
+    index = get_index()
+    query = _normalise(query)
+
+    if not query:
+        matches = list(range(len(index["names"])))
+    else:
+        words = query.split()
+        exact = _prefix_matches(index, words[0])
+        for word in words[1:]:
+            exact &= _prefix_matches(index, word)
+        ranked = [
+            (0 if index["texts"][i].startswith(query) else 1, 0.0, i) for i in exact
+        ]
+
+        query_trigrams = _trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(index["trigrams"].get(trigram, ()))
+        for i, n_shared in shared.items():
+            similarity = n_shared / len(query_trigrams)
+            if i not in exact and similarity >= FUZZY_THRESHOLD:
+                ranked.append((2, -similarity, i))
+
+        # Ties keep the dropdown order
+        matches = [i for _, _, i in sorted(ranked)]
+
+    start = (page - 1) * page_size
+    return {
+        "results": [
+            {"id": index["names"][i], "text": index["names"][i]}
+            for i in matches[start : start + page_size]
+        ],
+        "pagination": {"more": start + page_size < len(matches)},
+    }
+
+
+def invalidate():
+    """Drop the indexes so they are rebuilt from new reference data."""
+    _indexes.clear()
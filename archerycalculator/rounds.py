@@ -1,18 +1,28 @@
+from datetime import datetime, timezone
+import hashlib
+import os
+
+import click
 from flask import (
     Blueprint,
+    current_app,
+    make_response,
     render_template,
+    request,
 )
 
-from archerycalculator.db import query_db, sql_to_dol
+from archerycalculator.db import data_stamp, query_db, sql_to_dol, stamp_mtime
 
 from archerycalculator import utils
 
 
 bp = Blueprint("rounds", __name__, url_prefix="/rounds")
 
+# Rendered page for each database, see get_page()
+_pages = {}
 
-@bp.route("/", strict_slashes=False)
-def rounds_page():
+
+def _render_rounds():
 
     rounds = {}
 
@@ -31,15 +41,24 @@ def rounds_page():
     # TODO These don't have a family allocated.
     # Condiser doing so or extending fetch and sort function
     rounds["AGB VI"] = sql_to_dol(
-        query_db("SELECT code_name,round_name FROM rounds WHERE body in ('AGB-VI')")
+        query_db(
+            "SELECT code_name,round_name FROM rounds "
+            "WHERE body in ('AGB-VI') ORDER BY id"
+        )
     )
 
     rounds["WA VI"] = sql_to_dol(
-        query_db("SELECT code_name,round_name FROM rounds WHERE body in ('WA-VI')")
+        query_db(
+            "SELECT code_name,round_name FROM rounds "
+            "WHERE body in ('WA-VI') ORDER BY id"
+        )
     )
 
     rounds["Custom"] = sql_to_dol(
-        query_db("SELECT code_name,round_name FROM rounds WHERE body in ('custom')")
+        query_db(
+            "SELECT code_name,round_name FROM rounds "
+            "WHERE body in ('custom') ORDER BY id"
+        )
     )
 
     for roundtype in rounds:
@@ -58,3 +77,95 @@ def rounds_page():
         }
 
     return render_template("rounds.html", rounds=rounds, error=None)
+
+
+def get_page():
+    """
+    Get the rounds page, rendered once per version of the reference data.
+
+    The page only depends on the rounds in the database, so it is rendered on
+    first use and kept until the database's data_stamp() changes.
+
+    Returns
+    -------
+    page : dict
+        'body' as UTF-8 bytes, its 'etag' and the 'last_modified' time of the
+        database it was rendered from
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    stamp = data_stamp(database)
+    page = _pages.get(database)
+    if page is None or page["stamp"] != stamp:
+        body = _render_rounds().encode("utf8")
+        page = {
+            "stamp": stamp,
+            "body": body,
+            "etag": hashlib.sha1(body).hexdigest(),
+            # Whole seconds as for the HTTP header
+            "last_modified": datetime.fromtimestamp(
+                int(stamp_mtime(stamp)), timezone.utc
+            ),
+        }
+        _pages[database] = page
+    return page
+
+
+@bp.route("/", strict_slashes=False)
+def rounds_page():
+    page = get_page()
+    response = make_response(page["body"])
+    response.set_etag(page["etag"])
+    response.last_modified = page["last_modified"]
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["ROUNDS_PAGE_MAX_AGE"]
+    # Answers with 304 Not Modified if the client's copy is current
+    return response.make_conditional(request)
+
+
+def invalidate():
+    """Drop the rendered pages so they are rebuilt from new reference data."""
+    _pages.clear()
+
+
+def export_page(filename):
+    """
+    Save the rounds page as a static file, e.g. to be served by nginx or a CDN.
+
+    Parameters
+    ----------
+    filename : str
+        file to write the page to
+
+    References
+    ----------
+    """
+    # Rendered as if for a request so that links to static files are filled in
+    with current_app.test_request_context("/rounds/"):
+        page = get_page()
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, "wb") as f:
+        f.write(page["body"])
+    # Servers use the file time for their Last-Modified header
+    timestamp = page["last_modified"].timestamp()
+    os.utime(filename, (timestamp, timestamp))
+
+
+# define command line argument 'export-rounds' to save the rounds page
+@click.command("export-rounds")
+@click.argument("filename", required=False)
+def export_rounds_command(filename):
+    """Save the rounds page as a static HTML file."""
+    if filename is None:
+        filename = os.path.join(
+            current_app.instance_path, "export", "rounds", "index.html"
+        )
+    export_page(filename)
+    click.echo(f"Saved the rounds page to {filename}.")
+
+
+def init_app(app):
+    # add export_rounds_command to be called from flask app
+    app.cli.add_command(export_rounds_command)
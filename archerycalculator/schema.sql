@@ -29,11 +29,22 @@ CREATE TABLE rounds (
   code_name TEXT UNIQUE NOT NULL,
   location TEXT,
   body TEXT NOT NULL,
-  family TEXT NOT NULL
+  family TEXT NOT NULL,
+  compound_code_name TEXT NOT NULL,
+  max_score REAL NOT NULL,
+  max_distance REAL NOT NULL,
+  display_order INTEGER NOT NULL
 );
 
+CREATE INDEX rounds_round_name ON rounds (round_name);
+CREATE INDEX rounds_location_body ON rounds (location, body, display_order);
+CREATE INDEX rounds_family ON rounds (family);
+CREATE INDEX rounds_body ON rounds (body);
+
 CREATE TABLE classes (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   shortname TEXT NOT NULL,
   longname TEXT NOT NULL
 );
+
+CREATE INDEX classes_shortname ON classes (shortname);
@@ -0,0 +1,275 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+
+import click
+from flask import current_app
+
+from archerycalculator import api, refdata
+
+# Records read, solved and written at once
+CHUNK_SIZE = 10000
+# Columns added to each record in the output
+RESULT_FIELDS = ["handicap", "decimal_handicap", "classification", "error"]
+# Settings passed on to worker processes so they use the same data
+WORKER_CONFIG = [
+    "DATABASE",
+    "DATABASE_MMAP_SIZE",
+    "DATABASE_CACHE_SIZE",
+    "DATABASE_CACHED_STATEMENTS",
+    "HC_LOOKUP_DIR",
+    "CLASS_SCORES_FILE",
+    "SNAPSHOT_FILE",
+]
+
+# App used by each worker process, created by _init_worker
+_worker_app = None
+
+
+class _UnreadableRecord(dict):
+    # Stands in for a line of a JSONL file that is not a JSON object
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+
+def guess_format(filename):
+    """
+    Guess the format of a results file from its extension.
+
+    Parameters
+    ----------
+    filename : str
+        name of the file
+
+    Returns
+    -------
+    file_format : str
+        'jsonl' for .jsonl, .ndjson and .json files, otherwise 'csv'
+
+    References
+    ----------
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in [".jsonl", ".ndjson", ".json"]:
+        return "jsonl"
+    return "csv"
+
+
+def read_records(stream, file_format):
+    """
+    Read records of scores one at a time.
+
+    Parameters
+    ----------
+    stream : file
+        open text file of results
+    file_format : str
+        'csv' with a header row, or 'jsonl' with one JSON object per line
+
+    Yields
+    ------
+    record : dict
+        the fields of one result, or an empty record holding an error for
+        JSONL lines that are not JSON objects
+
+    References
+    ----------
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if isinstance(record, dict):
+                yield record
+            else:
+                yield _UnreadableRecord(f"Invalid JSON object on line {line_number}.")
+
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(config):
+    # Imported here as the package imports this module
+    from archerycalculator import create_app
+
+    global _worker_app
+    _worker_app = create_app(config)
+    _worker_app.app_context().push()
+
+
+def _score_round(checked):
+    return api.score_records(checked)
+
+
+def score_records(records, executor=None):
+    """
+    Handicaps and classifications for a chunk of records.
+
+    Rounds are resolved as in calculator.calculator, with compound scoring
+    where needed, and classifications are taken against that same round.
+    Records are solved together for each round, in worker processes if an
+    executor is given.
+
+    Parameters
+    ----------
+    records : list of dict
+        'round', 'score', 'bowstyle', 'gender' and 'age', and optionally
+        'scheme' and 'diameter' in mm, for each result, with empty values
+        treated as missing
+    executor : concurrent.futures.Executor
+        pool to solve the rounds in, with _init_worker run in each process
+
+    Returns
+    -------
+    results : list of dict
+        'handicap', 'decimal_handicap' and 'classification', or 'error', for
+        each record
+
+    References
+    ----------
+    """
+    reference = refdata.get_refdata()
+    results = [{} for _ in records]
+    groups = {}
+    for i, record in enumerate(records):
+        if isinstance(record, _UnreadableRecord):
+            results[i]["error"] = record.error
+            continue
+        # Empty CSV cells are treated as missing values
+        present = {k: v for k, v in record.items() if v not in ["", None]}
+        checked, error = api.check_record(present, reference)
+        if error is not None:
+            results[i]["error"] = error
+            continue
+        groups.setdefault(checked["codename"], []).append((i, checked))
+
+    batches = [[c for _, c in group] for group in groups.values()]
+    if executor is None:
+        scored = map(_score_round, batches)
+    else:
+        scored = executor.map(_score_round, batches)
+    for group, group_results in zip(groups.values(), scored):
+        for (i, _), result in zip(group, group_results):
+            results[i] = {k: result[k] for k in RESULT_FIELDS if k in result}
+    return results
+
+
+def score_file(infile, outfile, file_format=None, chunk_size=CHUNK_SIZE, processes=1):
+    """
+    Add handicaps and classifications to a file of results.
+
+    The file is read, solved and written in chunks so that it never has to be
+    held in memory at once. Output is in the same format as the input, with
+    the result columns added to each record.
+
+    Parameters
+    ----------
+    infile, outfile : str
+        files to read the results from and write them to
+    file_format : str
+        'csv' or 'jsonl', guessed from the input file name by default
+    chunk_size : int
+        records to solve at once
+    processes : int
+        worker processes to solve rounds in, 1 to solve in this process
+
+    Returns
+    -------
+    n_records, n_errors : int
+        number of records written and number that could not be scored
+
+    References
+    ----------
+    """
+    if file_format is None:
+        file_format = guess_format(infile)
+
+    executor = None
+    if processes > 1:
+        config = {k: current_app.config[k] for k in WORKER_CONFIG}
+        executor = ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(config,)
+        )
+
+    n_records = 0
+    n_errors = 0
+    try:
+        with open(infile, newline="") as stream, open(outfile, "w", newline="") as out:
+            if file_format == "csv":
+                # Every input column is kept, even if its first cells are empty
+                reader = csv.DictReader(stream)
+                columns = list(reader.fieldnames or [])
+                fieldnames = columns + [k for k in RESULT_FIELDS if k not in columns]
+                writer = csv.DictWriter(
+                    out, fieldnames, restval="", extrasaction="ignore"
+                )
+                writer.writeheader()
+                records = iter(reader)
+            else:
+                records = read_records(stream, file_format)
+
+            for chunk in _chunks(records, chunk_size):
+                for record, result in zip(chunk, score_records(chunk, executor)):
+                    n_errors += "error" in result
+                    if file_format == "csv":
+                        # Replace any results already in the file
+                        cells = {k: result.get(k, "") for k in RESULT_FIELDS}
+                        writer.writerow({**record, **cells})
+                    else:
+                        out.write(json.dumps({**record, **result}) + "\n")
+                n_records += len(chunk)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return n_records, n_errors
+
+
+# define command line argument 'score-file' to score a file of results
+@click.command("score-file")
+@click.argument("infile")
+@click.argument("outfile")
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["csv", "jsonl"]),
+    help="Format of the files, guessed from INFILE by default.",
+)
+@click.option(
+    "--chunk-size",
+    default=CHUNK_SIZE,
+    show_default=True,
+    help="Records to solve at once.",
+)
+@click.option(
+    "--processes",
+    default=1,
+    show_default=True,
+    help="Worker processes to solve rounds in.",
+)
+def score_file_command(infile, outfile, file_format, chunk_size, processes):
+    """Add handicaps and classifications to a CSV or JSONL file of results."""
+    n_records, n_errors = score_file(
+        infile, outfile, file_format, chunk_size, processes
+    )
+    click.echo(f"Scored {n_records} records ({n_errors} could not be scored).")
+
+
+def init_app(app):
+    # add score_file_command to be called from flask app
+    app.cli.add_command(score_file_command)
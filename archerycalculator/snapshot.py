@@ -0,0 +1,256 @@
+import mmap
+import os
+import pickle
+import struct
+
+import click
+from flask import current_app
+
+from archerycalculator import class_scores, refdata, registry
+from archerycalculator.db import close_db, data_stamp, get_write_db, query_db
+
+MAGIC = b"ACSNAP01"
+# Bumped when the contents change so that old snapshots are ignored
+SNAPSHOT_VERSION = 3
+# Version, database stamp and offset and length of the index, written after
+# the magic bytes so that a snapshot can be checked without unpickling it
+HEADER = struct.Struct("<Q4qQQ")
+# Buffers are aligned so that arrays over them are aligned too
+ALIGNMENT = 64
+
+# Loaded snapshots, keyed by database path
+_snapshots = {}
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % ALIGNMENT))
+
+
+def build_snapshot(filename):
+    """
+    Save everything the app derives at start up to a single file.
+
+    This is the round registry, reference data and dropdown choices, the rounds
+    table in display order and the classification score stores for every
+    category. Arrays are stored out of band so that they can be used straight
+    from a memory map.
+
+    Parameters
+    ----------
+    filename : str
+        file to write the snapshot to
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    # Move everything into the database file so that its stamp is settled
+    get_write_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    close_db()
+
+    class_scores.build_stores()
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "database": data_stamp(database),
+        "rounds": dict(registry.get_rounds()),
+        "refdata": refdata.get_refdata(),
+        "listings": [
+            tuple(row)
+            for row in query_db(
+                "SELECT location,body,code_name,round_name FROM rounds "
+                "ORDER BY display_order"
+            )
+        ],
+        "class_scores": {
+            discipline: class_scores.get_store(discipline)
+            for discipline in class_scores.SCORE_FUNCS
+        },
+    }
+
+    buffers = []
+    payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    tmp_filename = filename + ".tmp"
+    stamp = data["database"]
+    with open(tmp_filename, "wb") as f:
+        f.write(MAGIC + HEADER.pack(SNAPSHOT_VERSION, *stamp, 0, 0))
+        index = {"buffers": []}
+        for buffer in buffers:
+            _pad(f)
+            raw = buffer.raw()
+            index["buffers"].append((f.tell(), raw.nbytes))
+            f.write(raw)
+        index["payload"] = (f.tell(), len(payload))
+        f.write(payload)
+        index_bytes = pickle.dumps(index)
+        index_offset = f.tell()
+        f.write(index_bytes)
+        f.seek(len(MAGIC))
+        f.write(HEADER.pack(SNAPSHOT_VERSION, *stamp, index_offset, len(index_bytes)))
+    # Replace atomically so running workers never see a partial file
+    os.replace(tmp_filename, filename)
+
+
+def _read_header(view, filename):
+    if view[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{filename} is not an archerycalculator snapshot.")
+    version, *stamp, index_offset, index_length = HEADER.unpack_from(view, len(MAGIC))
+    return version, tuple(stamp), index_offset, index_length
+
+
+def read_snapshot_header(filename):
+    """
+    Read the version and database stamp of a snapshot without unpickling it.
+
+    Parameters
+    ----------
+    filename : str
+        file written by build_snapshot()
+
+    Returns
+    -------
+    version : int
+        SNAPSHOT_VERSION the snapshot was written with
+    stamp : tuple of int
+        data_stamp() of the database the snapshot was built from
+
+    References
+    ----------
+    """
+    with open(filename, "rb") as f:
+        header = f.read(len(MAGIC) + HEADER.size)
+    if len(header) < len(MAGIC) + HEADER.size:
+        raise ValueError(f"{filename} is not an archerycalculator snapshot.")
+    version, stamp, _, _ = _read_header(header, filename)
+    return version, stamp
+
+
+def read_snapshot(filename):
+    """
+    Read a snapshot file through a memory map.
+
+    Arrays in the snapshot are read-only views of the mapped file, so processes
+    reading the same file share its pages.
+
+    Parameters
+    ----------
+    filename : str
+        file written by build_snapshot()
+
+    Returns
+    -------
+    data : dict
+        contents of the snapshot
+
+    References
+    ----------
+    """
+    with open(filename, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    _, _, index_offset, index_length = _read_header(view, filename)
+    index = pickle.loads(view[index_offset : index_offset + index_length])
+    offset, length = index["payload"]
+    return pickle.loads(
+        view[offset : offset + length],
+        buffers=[view[start : start + nbytes] for start, nbytes in index["buffers"]],
+    )
+
+
+def load_snapshot(filename):
+    """
+    Use a snapshot for the current app if it matches its database.
+
+    Parameters
+    ----------
+    filename : str
+        file written by build_snapshot()
+
+    Returns
+    -------
+    loaded : bool
+        True if the snapshot was loaded, False if it is missing, out of date or
+        cannot be read
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    if filename is None or not os.path.exists(filename):
+        return False
+    if not os.path.exists(database):
+        return False
+    stamp = data_stamp(database)
+    try:
+        # Checked before unpickling, so an old snapshot is never unpickled
+        version, snapshot_stamp = read_snapshot_header(filename)
+        if version != SNAPSHOT_VERSION or snapshot_stamp != stamp:
+            current_app.logger.warning(
+                f"Ignoring snapshot {filename} as it is out of date, "
+                "run 'flask build-snapshot' to rebuild it."
+            )
+            return False
+        data = read_snapshot(filename)
+    except Exception as e:
+        # Carry on without it, a bad snapshot must not stop the app starting
+        current_app.logger.error(
+            f"Ignoring snapshot {filename} as it could not be read ({e!r}), "
+            "run 'flask build-snapshot' to rebuild it."
+        )
+        return False
+
+    registry.set_rounds(data["rounds"])
+    refdata.preload(data["refdata"])
+    class_scores.preload(data["class_scores"])
+    _snapshots[database] = data
+    return True
+
+
+def get_listings():
+    """
+    Rounds in display order from the snapshot for the current app's database.
+
+    Returns
+    -------
+    listings : list of tuple or None
+        (location, body, code_name, round_name) for each round, or None if no
+        snapshot is loaded
+
+    References
+    ----------
+    """
+    database = current_app.config["DATABASE"]
+    data = _snapshots.get(database)
+    if data is None or data["database"] != data_stamp(database):
+        # The database has been written to since the snapshot was loaded
+        return None
+    return data["listings"]
+
+
+def invalidate():
+    """Stop using snapshots, e.g. once the database is rebuilt."""
+    _snapshots.clear()
+    registry.reset_rounds()
+
+
+# define command line argument 'build-snapshot' to save the start up data
+@click.command("build-snapshot")
+def build_snapshot_command():
+    """Save the rounds, reference data and classification tables to one file."""
+    filename = current_app.config["SNAPSHOT_FILE"]
+    build_snapshot(filename)
+    click.echo(f"Saved snapshot to {filename}.")
+
+
+def init_app(app):
+    # add build_snapshot_command to be called from flask app
+    app.cli.add_command(build_snapshot_command)
+
+    # Use the snapshot from a previous build-snapshot if there is one. Not for
+    # command line use, as init-db and the build commands must start from the
+    # round files and the database rather than an old snapshot.
+    if click.get_current_context(silent=True) is not None:
+        return
+    with app.app_context():
+        load_snapshot(app.config.get("SNAPSHOT_FILE"))
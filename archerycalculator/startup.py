@@ -0,0 +1,117 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+import click
+from flask import current_app
+
+from archerycalculator import class_scores, lazy, refdata, registry
+
+# Line format written to stderr by python -X importtime
+IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def warm_up():
+    """
+    Do the loading otherwise left to the first requests.
+
+    Imports the deferred modules, loads the rounds and, if the database has been
+    built, the reference data and classification score stores.
+
+    Returns
+    -------
+    timings : dict of str: float
+        seconds taken by each step that was run
+
+    References
+    ----------
+    """
+    steps = {
+        "imports": lazy.load_all,
+        "rounds": registry.get_rounds,
+    }
+    if os.path.exists(current_app.config["DATABASE"]):
+        steps["refdata"] = refdata.get_refdata
+        steps["classification"] = lambda: [
+            class_scores.get_store(discipline)
+            for discipline in class_scores.SCORE_FUNCS
+        ]
+
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def import_report(code="from archerycalculator import create_app; create_app()"):
+    """
+    Time the imports made by some code using python -X importtime.
+
+    The code is run in a fresh interpreter so that nothing is already imported.
+
+    Parameters
+    ----------
+    code : str
+        python statements to time
+
+    Returns
+    -------
+    imports : list of tuple
+        (module name, self time, cumulative time) in microseconds for each
+        top level import, slowest first
+
+    References
+    ----------
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        # Nested imports are indented and already counted by their parents
+        if len(indent) == 1:
+            imports.append((name, int(self_us), int(cumulative_us)))
+    return sorted(imports, key=lambda item: item[2], reverse=True)
+
+
+# define command line argument 'warm-up' to load everything before serving
+@click.command("warm-up")
+def warm_up_command():
+    """Import deferred modules and load the rounds and reference data."""
+    for name, seconds in warm_up().items():
+        click.echo(f"{name}: {seconds * 1000:.1f} ms")
+
+
+# define command line argument 'import-report' to show the slowest imports
+@click.command("import-report")
+@click.option("--top", default=20, show_default=True, help="Imports to list.")
+def import_report_command(top):
+    """Show the slowest imports made when creating the app."""
+    imports = import_report()
+    for name, self_us, cumulative_us in imports[:top]:
+        click.echo(f"{cumulative_us / 1000:9.1f} ms  {self_us / 1000:9.1f} ms  {name}")
+    total_us = sum(item[2] for item in imports)
+    click.echo(f"{total_us / 1000:9.1f} ms in total")
+
+
+def init_app(app):
+    # add warm_up_command and import_report_command to be called from flask app
+    app.cli.add_command(warm_up_command)
+    app.cli.add_command(import_report_command)
+
+    # Optionally do the loading now rather than on the first requests
+    if app.config["WARM_UP"]:
+        with app.app_context():
+            warm_up()
@@ -1,56 +1,154 @@
+import csv
+import io
+import math
+
 from flask import (
     Blueprint,
+    Response,
+    current_app,
     render_template,
     request,
+    stream_template,
+    stream_with_context,
 )
-import numpy as np
 
-from archerycalculator.db import query_db, sql_to_dol
+from archerycalculator.db import data_stamp, query_db, sql_to_dol
 
-from archeryutils import load_rounds
-from archeryutils.handicaps import handicap_equations as hc_eq
-from archeryutils.classifications import classifications as class_func
+from archerycalculator import (
+    TableForm,
+    class_scores,
+    refdata,
+    registry,
+    response_cache,
+    timing,
+    utils,
+)
+from archerycalculator.lazy import lazy_import
 
-from archerycalculator import TableForm, utils
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
+hc_eq = lazy_import("archeryutils.handicaps.handicap_equations")
 
 bp = Blueprint("tables", __name__, url_prefix="/tables")
 
+# Largest number of handicaps allowed in one table
+MAX_HC_TABLE_ROWS = 5001
+# Handicaps computed at once when streaming handicap books
+HC_BOOK_CHUNK_SIZE = 64
+
+
+def handicap_range(hc_min, hc_max, hc_step):
+    """
+    Handicaps to tabulate from a requested range and step.
+
+    Parameters
+    ----------
+    hc_min, hc_max : float
+        lowest and highest handicap to include
+    hc_step : float
+        spacing between handicaps
+
+    Returns
+    -------
+    handicaps : np.ndarray or None
+        handicaps to tabulate, None if the request is not valid
+    error : str or None
+        error message if the request is not valid
+
+    References
+    ----------
+    """
+    if not all(math.isfinite(value) for value in [hc_min, hc_max, hc_step]):
+        return None, "Handicap range and step must be numbers."
+    if hc_step <= 0.0 or hc_max < hc_min:
+        return (
+            None,
+            "Handicap step must be positive and the highest handicap no lower "
+            "than the lowest.",
+        )
+    if (hc_max - hc_min) / hc_step + 1 > MAX_HC_TABLE_ROWS:
+        return (
+            None,
+            f"Please choose a range and step giving at most {MAX_HC_TABLE_ROWS} "
+            "handicaps.",
+        )
+    # Round off handicaps to avoid floating point noise from the step
+    handicaps = np.round(
+        hc_min + hc_step * np.arange(int((hc_max - hc_min) / hc_step + 1.0e-9) + 1),
+        10,
+    )
+    return handicaps, None
+
+
+def _decimal_to_float(value):
+    # Signalling NaN cannot be converted, so all NaN and blank fields become NaN
+    # to be rejected by handicap_range()
+    if value is None or value.is_nan():
+        return math.nan
+    return float(value)
+
+
+def handicap_decimals(handicaps):
+    """Decimal places needed to display handicaps, up to 2."""
+    hc_decimals = 0
+    while hc_decimals < 2 and np.any(
+        np.round(handicaps, hc_decimals) != np.round(handicaps, 2)
+    ):
+        hc_decimals += 1
+    return hc_decimals
+
+
+def clean_repeated_scores(scores, scheme):
+    """
+    Blank out repeated scores in a handicap table, in place
+
+    Where several handicaps give the same score keep the worst handicap, as
+    handicap_from_score does. That is the last in a run for AGB schemes and the
+    first for AA schemes.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        scores with one row per handicap and one column per round
+    scheme : str
+        handicap scheme the scores were calculated with
+
+    Returns
+    -------
+    scores : np.ndarray
+        input array with repeated entries set to -9999
+
+    References
+    ----------
+    """
+    # TODO: setting fill to -9999 is a bit hacky to get around jinja interpreting
+    #  0, NaN, and None as the same thing. Consider finding better solution.
+    repeats = scores[:-1] == scores[1:]
+    if scheme in ["AA", "AA2"]:
+        scores[1:][repeats] = -9999
+    else:
+        scores[:-1][repeats] = -9999
+    return scores
+
 
 @bp.route("/handicap", methods=("GET", "POST"))
+@response_cache.cached
 def handicap_tables():
 
     form = TableForm.HandicapTableForm(request.form)
 
-    roundnames = sql_to_dol(query_db("SELECT code_name,round_name FROM rounds"))
-    all_rounds = utils.indoor_display_filter(
-        dict(zip(roundnames["code_name"], roundnames["round_name"]))
-    )
-
-    # Set defaults
-    form.round1.choices = [""] + all_rounds
-    form.round2.choices = [""] + all_rounds
-    form.round3.choices = [""] + all_rounds
-    form.round4.choices = [""] + all_rounds
-    form.round5.choices = [""] + all_rounds
-    form.round6.choices = [""] + all_rounds
-    form.round7.choices = [""] + all_rounds
+    # Set defaults, other rounds are found through the search API
+    form.round1.choices = refdata.round_choices(form.round1.data)
+    form.round2.choices = refdata.round_choices(form.round2.data)
+    form.round3.choices = refdata.round_choices(form.round3.data)
+    form.round4.choices = refdata.round_choices(form.round4.data)
+    form.round5.choices = refdata.round_choices(form.round5.data)
+    form.round6.choices = refdata.round_choices(form.round6.data)
+    form.round7.choices = refdata.round_choices(form.round7.data)
 
     if request.method == "POST" and form.validate():
         error = None
 
-        all_rounds_objs = load_rounds.read_json_to_round_dict(
-            [
-                "AGB_outdoor_imperial.json",
-                "AGB_outdoor_metric.json",
-                "AGB_indoor.json",
-                "WA_outdoor.json",
-                "WA_indoor.json",
-                "WA_field.json",
-                "IFAA_field.json",
-                "Custom.json",
-            ]
-        )
-
         # Get form results
         rounds_req = []
         rounds_comp = []
@@ -66,14 +164,28 @@ def handicap_tables():
         if request.form.getlist("allowance"):
             allowance_table = True
 
+        # advanced options
+        scheme = form.scheme.data
+        if scheme not in ["AGB", "AGBold", "AA", "AA2"]:
+            scheme = "AGB"
+        handicaps, error = handicap_range(
+            _decimal_to_float(form.hc_min.data),
+            _decimal_to_float(form.hc_max.data),
+            _decimal_to_float(form.hc_step.data),
+        )
+        if error is not None:
+            return render_template(
+                "handicap_tables.html",
+                form=form,
+                error=error,
+            )
+
         round_objs = []
         for (round_i, comp_i) in zip(rounds_req, rounds_comp):
-            round_query = query_db(
-                "SELECT code_name FROM rounds WHERE round_name IS (?)",
-                [round_i],
-                one=True,
-            )
-            if round_query is None:
+            # Get the appropriate rounds from the registry, with compound scoring
+            # if required
+            round_obj = registry.get_round_by_name(round_i, compound=comp_i)
+            if round_obj is None:
                 error = f"Invalid round name '{round_i}'. Please start typing and select from dropdown."
                 # If errors reload default with error message
                 return render_template(
@@ -81,38 +193,24 @@ def handicap_tables():
                     form=form,
                     error=error,
                 )
-            else:
-                round_codename = round_query["code_name"]
-
-            # Check if we need compound scoring
-            if comp_i:
-                round_codename = utils.get_compound_codename(round_codename)
-
-            # Get the appropriate rounds from the database
-            round_objs.append(all_rounds_objs[round_codename])
+            round_objs.append(round_obj)
 
         # Generate the handicap params
         hc_params = hc_eq.HcParams()
 
-        results = np.zeros([151, len(round_objs) + 1])
-        results[:, 0] = np.arange(0, 151).astype(np.int32)
-        for i, round_obj_i in enumerate(round_objs):
-            results[:, i + 1] = hc_eq.score_for_round(
-                round_obj_i, results[:, 0], "AGB", hc_params
-            )[0].astype(np.int32)
+        results = np.zeros([len(handicaps), len(round_objs) + 1])
+        results[:, 0] = handicaps
+        with timing.timer("handicap"):
+            for i, round_obj_i in enumerate(round_objs):
+                results[:, i + 1] = hc_eq.score_for_round(
+                    round_obj_i, handicaps, scheme, hc_params
+                )[0].astype(np.int32)
 
         if allowance_table:
             results[:, 1:] = 1440 - results[:, 1:]
         else:
             # Clean gaps where there are multiple HC for one score
-            # TODO: This assumes scores are running highest to lowest.
-            #  AA and AA2 will only work if hcs passed in reverse order (large to small)
-            # TODO: setting fill to -9999 is a bit hacky to get around jinja interpreting
-            #  0, NaN, and None as the same thing. Consider finding better solution.
-            for irow, row in enumerate(results[:-1, 1:]):
-                for jscore, score in enumerate(row):
-                    if results[irow, jscore + 1] == results[irow + 1, jscore + 1]:
-                        results[irow, jscore + 1] = -9999
+            clean_repeated_scores(results[:, 1:], scheme)
 
         # Return the results
         return render_template(
@@ -120,6 +218,7 @@ def handicap_tables():
             form=form,
             roundnames=rounds_req,
             results=results,
+            hc_decimals=handicap_decimals(handicaps),
         )
 
     # If first visit load the default form with no inputs
@@ -130,23 +229,150 @@ def handicap_tables():
     )
 
 
+def handicap_book_rows(round_objs, handicaps, scheme, allowance=False):
+    """
+    Generate handicap table rows a chunk of handicaps at a time.
+
+    Each chunk is computed with one extra handicap either side so repeated
+    scores are cleaned correctly across chunk boundaries.
+
+    Parameters
+    ----------
+    round_objs : list of archeryutils.Round
+        rounds to tabulate, one column each
+    handicaps : np.ndarray
+        handicaps to tabulate, one row each
+    scheme : str
+        handicap scheme to use
+    allowance : bool
+        give allowances (1440 - score) rather than scores
+
+    Yields
+    ------
+    row : list of float
+        handicap followed by the score for each round, -9999 for blanks
+
+    References
+    ----------
+    """
+    hc_params = hc_eq.HcParams()
+    n_hc = len(handicaps)
+    for start in range(0, n_hc, HC_BOOK_CHUNK_SIZE):
+        stop = min(start + HC_BOOK_CHUNK_SIZE, n_hc)
+        lo = max(start - 1, 0)
+        hi = min(stop + 1, n_hc)
+
+        scores = np.zeros([hi - lo, len(round_objs)])
+        for i, round_obj_i in enumerate(round_objs):
+            scores[:, i] = hc_eq.score_for_round(
+                round_obj_i, handicaps[lo:hi], scheme, hc_params
+            )[0].astype(np.int32)
+
+        if allowance:
+            scores = 1440 - scores
+        else:
+            clean_repeated_scores(scores, scheme)
+
+        for j in range(start, stop):
+            yield [handicaps[j]] + scores[j - lo].tolist()
+
+
+@bp.route("/handicap/book", methods=("GET",))
+def handicap_book():
+    """
+    Handicap tables for any number of rounds, streamed as CSV or HTML.
+
+    Query arguments are 'round' (repeat for each round, every round if not
+    given), 'compound', 'allowance', 'scheme', 'hc_min', 'hc_max', 'hc_step'
+    and 'format' ('csv' or 'html').
+    """
+    error = None
+    roundnames = request.args.getlist("round")
+    if not roundnames:
+        roundnames = list(refdata.get_refdata()["round_names"])
+    compound = bool(request.args.get("compound"))
+    allowance = bool(request.args.get("allowance"))
+    scheme = request.args.get("scheme", "AGB")
+    output_format = request.args.get("format", "csv")
+
+    if scheme not in ["AGB", "AGBold", "AA", "AA2"]:
+        error = f"Invalid scheme '{scheme}'."
+    elif output_format not in ["csv", "html"]:
+        error = f"Invalid format '{output_format}', use 'csv' or 'html'."
+    try:
+        handicaps, range_error = handicap_range(
+            float(request.args.get("hc_min", 0)),
+            float(request.args.get("hc_max", 150)),
+            float(request.args.get("hc_step", 1)),
+        )
+        error = error or range_error
+    except ValueError:
+        error = "Handicap range and step must be numbers."
+
+    round_objs = []
+    if error is None:
+        for round_i in roundnames:
+            round_obj = registry.get_round_by_name(round_i, compound=compound)
+            if round_obj is None:
+                error = f"Invalid round name '{round_i}'."
+                break
+            round_objs.append(round_obj)
+
+    if error is not None:
+        return Response(error, status=400, mimetype="text/plain")
+
+    rows = handicap_book_rows(round_objs, handicaps, scheme, allowance=allowance)
+
+    if output_format == "html":
+        return Response(
+            stream_with_context(
+                stream_template(
+                    "handicap_book.html",
+                    roundnames=roundnames,
+                    results=rows,
+                    hc_decimals=handicap_decimals(handicaps),
+                )
+            ),
+            mimetype="text/html",
+        )
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["Handicap"] + roundnames)
+        for row in rows:
+            scores = ["" if item == -9999 else int(item) for item in row[1:]]
+            writer.writerow([f"{row[0]:g}"] + scores)
+            # Send each row as soon as it is ready
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(generate_csv()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=handicap_book.csv"},
+    )
+
+
 @bp.route("/classification", methods=("GET", "POST"))
+@response_cache.cached
 def classification_tables():
 
-    bowstylelist = sql_to_dol(query_db("SELECT bowstyle,disciplines FROM bowstyles"))[
-        "bowstyle"
-    ]
-    genderlist = sql_to_dol(query_db("SELECT gender FROM genders"))["gender"]
-    agelist = sql_to_dol(query_db("SELECT age_group FROM ages"))["age_group"]
-    classlist = sql_to_dol(query_db("SELECT shortname FROM classes"))["shortname"]
+    reference = refdata.get_refdata()
+    bowstylelist = reference["bowstyles"]
+    genderlist = reference["genders"]
+    agelist = reference["ages"]["age_group"]
+    classlist = list(reference["classes"])
 
     # Load form and set defaults
     form = TableForm.ClassificationTableForm(
         request.form, bowstyle=bowstylelist[1], gender=genderlist[1], age=agelist[1]
     )
-    form.bowstyle.choices = bowstylelist
-    form.gender.choices = genderlist
-    form.age.choices = agelist
+    form.bowstyle.choices = refdata.choices("bowstyle")
+    form.gender.choices = refdata.choices("gender")
+    form.age.choices = refdata.choices("age")
 
     form.discipline.choices = [
         ("outdoor", "Target Outdoor"),
@@ -166,28 +392,22 @@ def classification_tables():
         results = {}
 
         # Check the inputs are all valid
-        bowstylecheck = query_db(
-            "SELECT id FROM bowstyles WHERE bowstyle IS (?)", [bowstyle]
-        )
-        if len(bowstylecheck) == 0:
+        if bowstyle not in bowstylelist:
             error = "Invalid bowstyle. Please select from dropdown."
         results["bowstyle"] = bowstyle
 
-        gendercheck = query_db("SELECT id FROM genders WHERE gender IS (?)", [gender])
-        if len(gendercheck) == 0:
+        if gender not in genderlist:
             error = "Please select gender from dropdown options."
         results["gender"] = gender
 
-        agecheck = query_db("SELECT id FROM ages WHERE age_group IS (?)", [age])
-        if len(agecheck) == 0:
+        if age not in agelist:
             error = "Invalid age group. Please select from dropdown."
         results["age"] = age
 
         if discipline in ["outdoor"]:
-            use_rounds = sql_to_dol(
-                query_db(
-                    "SELECT code_name,round_name,family FROM rounds WHERE location IN ('outdoor') AND body in ('AGB','WA')"
-                )
+            # Already in the order desired for outputting
+            use_rounds = utils.fetch_and_sort_rounds(
+                location="outdoor", body=["AGB", "WA"]
             )
 
             if bowstyle.lower() in ["traditional", "flatbow"]:
@@ -200,41 +420,24 @@ def classification_tables():
                 use_rounds["code_name"], age, gender, bowstyle
             )
 
-            # Sort filtered rounds into the order desired for outputting
-            rounds_families = {
-                codename: family
-                for (codename, family) in dict(
-                    zip(use_rounds["code_name"], use_rounds["family"])
-                ).items()
-                if codename in filtered_names
-            }
-            ordered_names = list(utils.order_rounds(rounds_families).keys())
-
             # Get list of actual names for pretty output
-            # round_names = [
-            #    roundsdicts[key]
-            #    for key in list(roundsdicts.keys())
-            #    if key in ordered_names
-            # ]
-            round_names = [roundsdicts[codename] for codename in ordered_names]
+            round_names = [roundsdicts[codename] for codename in filtered_names]
 
             # Final dict of rounds to use
-            use_rounds = {"code_name": ordered_names, "round_name": round_names}
-
-            results = np.zeros([len(use_rounds["code_name"]), len(classlist) - 1])
-            for i, round_i in enumerate(use_rounds["code_name"]):
-                results[i, :] = np.asarray(
-                    class_func.AGB_outdoor_classification_scores(
-                        round_i, bowstyle, gender, age
-                    )
-                )
+            use_rounds = {"code_name": filtered_names, "round_name": round_names}
+
+            results = class_scores.classification_scores(
+                "outdoor", use_rounds["code_name"], bowstyle, gender, age
+            )
         elif discipline in ["indoor"]:
             # TODO: This is a bodge - put indoor classes in database properly and fetch above!
-            classlist = ["A", "B", "C", "D", "E", "F", "G", "H", "UC"]
+            classlist = class_scores.INDOOR_CLASSES + ["UC"]
 
             use_rounds = sql_to_dol(
                 query_db(
-                    "SELECT code_name,round_name FROM rounds WHERE location IN ('indoor') AND body in ('AGB','WA')"
+                    "SELECT code_name,round_name FROM rounds "
+                    "WHERE location IN ('indoor') AND body in ('AGB','WA') "
+                    "ORDER BY id"
                 )
             )
             # Filter out compound rounds for non-recurve and vice versa
@@ -250,16 +453,12 @@ def classification_tables():
                 codenames = utils.get_compound_codename(codenames)
             use_rounds = {"code_name": codenames, "round_name": noncompoundroundnames}
 
-            results = np.zeros([len(use_rounds["code_name"]), len(classlist) - 1])
-            for i, round_i in enumerate(use_rounds["code_name"]):
-                results[i, :] = np.asarray(
-                    class_func.AGB_indoor_classification_scores(
-                        round_i, bowstyle, gender, age
-                    )
-                )
+            results = class_scores.classification_scores(
+                "indoor", use_rounds["code_name"], bowstyle, gender, age
+            )
         elif discipline in ["field"]:
             # TODO: This is a bodge - put field classes in database properly and fetch above!
-            classlist = ["GMB", "MB", "B", "1", "2", "3", "UC"]
+            classlist = class_scores.FIELD_CLASSES + ["UC"]
 
             if bowstyle.lower() in ["recurve", "compound"]:
                 use_rounds = {
@@ -288,13 +487,9 @@ def classification_tables():
                     ],
                 }
 
-            results = np.zeros([len(use_rounds["code_name"]), len(classlist) - 1])
-            for i, round_i in enumerate(use_rounds["code_name"]):
-                results[i, :] = np.asarray(
-                    class_func.AGB_field_classification_scores(
-                        round_i, bowstyle, gender, age
-                    )
-                )
+            results = class_scores.classification_scores(
+                "field", use_rounds["code_name"], bowstyle, gender, age
+            )
         else:
             # Should never get here... placeholder for field...
             # use_rounds = sql_to_dol(query_db("SELECT code_name FROM rounds WHERE location IN ('field') AND body in ('AGB','WA')"))
@@ -341,31 +536,175 @@ def classification_tables():
     )
 
 
+# Round families shown in the event tables, outdoor families first then field
+EVENT_FAMILIES = {
+    "WA 1440/Metrics": ["wa1440", "metric1440"],
+    "WA 720/Metrics": ["wa720", "metric720"],
+    "York/Hereford/Bristols": ["york_hereford_bristol"],
+    "St. George/Albion/Windsor": ["stgeorge_albion_windsor"],
+    "National": ["national"],
+    "Western": ["western"],
+    "Warwick": ["warwick"],
+    "WA Field 24 Marked": ["wafield_24_marked"],
+    "WA Field 24 Unmarked": ["wafield_24_unmarked"],
+    "WA Field 24 Mixed": ["wafield_24_mixed"],
+}
+
+# Resolved rounds for each event table, see event_rounds()
+_event_rounds = {}
+
+
+def _family_rounds(families):
+    # Codenames and stored maximum distances, in the order rounds were inserted
+    return [
+        (row["code_name"], row["max_distance"])
+        for family_i in families
+        for row in query_db(
+            "SELECT code_name,max_distance FROM rounds WHERE family IS (?) "
+            "ORDER BY id",
+            [family_i],
+        )
+    ]
+
+
+def _outdoor_event_rounds(roundfamily, bowstyle, max_dist, genderlist, agelist):
+    family_rounds = _family_rounds(EVENT_FAMILIES[roundfamily])
+
+    event_rounds = []
+    for gender in genderlist:
+        for j, age_j in enumerate(agelist["age_group"]):
+
+            # Get appropriate round from distance
+            for rnd_i, max_distance in family_rounds:
+                if max_distance >= min(
+                    max_dist, int(agelist[f"{gender.lower()}_dist"][j])
+                ):
+                    age_round = rnd_i
+
+            # Check for 720 based on bowstyle
+            if roundfamily in list(EVENT_FAMILIES.keys())[1]:
+                if bowstyle.lower() in ["compound"]:
+                    age_round = age_round.replace("122", "80")
+                    age_round = age_round.replace("70", "50_c")
+                    age_round = age_round.replace("60", "50_c")
+                else:
+                    age_round = age_round.replace("80", "122")
+                    if age_j.lower().replace(" ", "") in ["adult", "under21"]:
+                        age_round = "wa720_70"
+                    elif age_j.lower().replace(" ", "") in ["50+", "under18"]:
+                        age_round = age_round.replace("70", "60")
+                    elif age_j.lower().replace(" ", "") in ["under16"]:
+                        age_round = "metric_122_50"
+                    if bowstyle.lower() in ["barebow"]:
+                        age_round = age_round.replace("70", "50_b")
+                        age_round = age_round.replace("60", "50_b")
+
+            # Check aliases
+            age_round = utils.check_alias(age_round, age_j, gender, bowstyle.lower())
+
+            event_rounds.append((gender, age_j, age_round))
+    return event_rounds
+
+
+def _field_event_rounds(roundfamily, bowstyle, genderlist):
+    # Done manually for now, update in future
+    agelist = {"age_group": ["Adult", "Under 18"], "peg": ["red", "red"]}
+    if bowstyle.lower() in ["barebow", "longbow", "traditional", "flatbow"]:
+        agelist["peg"] = ["blue", "blue"]
+
+    codenames = [
+        codename for codename, _ in _family_rounds(EVENT_FAMILIES[roundfamily])
+    ]
+
+    event_rounds = []
+    for gender in genderlist:
+        for j, age_j in enumerate(agelist["age_group"]):
+
+            # Get appropriate round from peg colour
+            age_app_rounds = [
+                rnd_i for rnd_i in codenames if f"{agelist['peg'][j]}" in rnd_i
+            ]
+
+            # Ensure 24 target round, not 12 target unit and remove duplicates
+            age_app_rounds = list(set([x.replace("12", "24") for x in age_app_rounds]))
+
+            event_rounds.append((gender, age_j, age_app_rounds[0]))
+    return event_rounds
+
+
+def event_rounds(roundfamily, bowstyle, restrict_to_named=False):
+    """
+    Rounds to show for each gender and age group in an event table.
+
+    Resolved from the registry and reference data once per family, bowstyle
+    and restriction, then reused until the database's data_stamp() changes.
+
+    Parameters
+    ----------
+    roundfamily : str
+        key of EVENT_FAMILIES
+    bowstyle : str
+        bowstyle of the table, traditional and flatbow already mapped to barebow
+        for outdoor families
+    restrict_to_named : bool
+        limit imperial named rounds to 60 yards
+
+    Returns
+    -------
+    event_rounds : tuple of (str, str, str, str)
+        gender, age group, round codename and round name for each table row
+
+    References
+    ----------
+    """
+    reference = refdata.get_refdata()
+    genderlist = reference["genders"]
+    agelist = reference["ages"]
+
+    # The database and its stamp are part of the key so that rounds and
+    # reference data written by init-db, in this or another process, are
+    # picked up
+    database = current_app.config["DATABASE"]
+    key = (
+        database,
+        data_stamp(database),
+        roundfamily,
+        bowstyle.lower(),
+        restrict_to_named,
+    )
+    if key not in _event_rounds:
+        if roundfamily in list(EVENT_FAMILIES.keys())[:7]:
+            # If restricting to named round set max dist as 60
+            if restrict_to_named and roundfamily in list(EVENT_FAMILIES.keys())[3:7]:
+                max_dist = 60
+            else:
+                max_dist = 9999
+            resolved = _outdoor_event_rounds(
+                roundfamily, bowstyle, max_dist, genderlist, agelist
+            )
+        else:
+            resolved = _field_event_rounds(roundfamily, bowstyle, genderlist)
+
+        all_rounds_objs = registry.get_rounds()
+        _event_rounds[key] = tuple(
+            (gender, age, codename, all_rounds_objs[codename].name)
+            for gender, age, codename in resolved
+        )
+    return _event_rounds[key]
+
+
 @bp.route("/classbyevent", methods=("GET", "POST"))
+@response_cache.cached
 def event_tables():
 
-    roundfamilies = {
-        "WA 1440/Metrics": ["wa1440", "metric1440"],
-        "WA 720/Metrics": ["wa720", "metric720"],
-        "York/Hereford/Bristols": ["york_hereford_bristol"],
-        "St. George/Albion/Windsor": ["stgeorge_albion_windsor"],
-        "National": ["national"],
-        "Western": ["western"],
-        "Warwick": ["warwick"],
-        "WA Field 24 Marked": ["wafield_24_marked"],
-        "WA Field 24 Unmarked": ["wafield_24_unmarked"],
-        "WA Field 24 Mixed": ["wafield_24_mixed"],
-    }
-
-    bowstylelist = sql_to_dol(query_db("SELECT bowstyle,disciplines FROM bowstyles"))[
-        "bowstyle"
-    ]
+    reference = refdata.get_refdata()
+    bowstylelist = reference["bowstyles"]
 
     # Load form and set defaults
     form = TableForm.EventTableForm(request.form, bowstyle=bowstylelist[1])
-    form.bowstyle.choices = bowstylelist
+    form.bowstyle.choices = refdata.choices("bowstyle")
 
-    form.roundfamily.choices = list(roundfamilies.keys())
+    form.roundfamily.choices = list(EVENT_FAMILIES.keys())
 
     if request.method == "POST" and form.validate():
         error = None
@@ -373,160 +712,36 @@ def event_tables():
         # Get form results and store for return
         bowstyle = request.form["bowstyle"]
         roundfamily = request.form["roundfamily"]
-
-        # If restricting to named round set max dist as 60
-        if (
-            request.form.getlist("restrict_to_named")
-            and roundfamily in list(roundfamilies.keys())[3:7]
-        ):
-            max_dist = 60
-        else:
-            max_dist = 9999
+        restrict_to_named = bool(request.form.getlist("restrict_to_named"))
 
         # Check the inputs are all valid
-        bowstylecheck = query_db(
-            "SELECT id FROM bowstyles WHERE bowstyle IS (?)", [bowstyle]
-        )
-        if len(bowstylecheck) == 0:
+        if bowstyle not in bowstylelist:
             error = "Invalid bowstyle. Please select from dropdown."
 
         # Account for nuances in each discipline and generate results
         # Target outdoor:
-        if roundfamily in list(roundfamilies.keys())[:7]:
-            all_rounds_objs = load_rounds.read_json_to_round_dict(
-                [
-                    "AGB_outdoor_imperial.json",
-                    "AGB_outdoor_metric.json",
-                    "WA_outdoor.json",
-                ]
-            )
+        if roundfamily in list(EVENT_FAMILIES.keys())[:7]:
             if bowstyle.lower() in ["traditional", "flatbow"]:
                 bowstyle = "barebow"
-
-            genderlist = sql_to_dol(query_db("SELECT gender FROM genders"))["gender"]
-            agelist = sql_to_dol(
-                query_db("SELECT age_group,male_dist,female_dist FROM ages")
-            )
-            classlist = sql_to_dol(query_db("SELECT shortname FROM classes"))[
-                "shortname"
-            ]
-
-            roundslist = {"code_name": [], "round_name": []}
-            for family_i in roundfamilies[roundfamily]:
-                roundslist_i = sql_to_dol(
-                    query_db(
-                        "SELECT code_name,round_name FROM rounds WHERE family IN (?)",
-                        [family_i],
-                    )
-                )
-                for k in roundslist:
-                    roundslist[k] = roundslist[k] + roundslist_i[k]
-
-            results = {}
-            for gender in genderlist:
-                for j, age_j in enumerate(agelist["age_group"]):
-
-                    # Get appropriate round from distance
-                    for i, rnd_i in enumerate(roundslist["code_name"]):
-                        if all_rounds_objs[rnd_i].max_distance() >= min(
-                            max_dist, int(agelist[f"{gender.lower()}_dist"][j])
-                        ):
-                            age_round = roundslist["code_name"][i]
-
-                    # Check for 720 based on bowstyle
-                    if roundfamily in list(roundfamilies.keys())[1]:
-                        if bowstyle.lower() in ["compound"]:
-                            age_round = age_round.replace("122", "80")
-                            age_round = age_round.replace("70", "50_c")
-                            age_round = age_round.replace("60", "50_c")
-                        else:
-                            age_round = age_round.replace("80", "122")
-                            if age_j.lower().replace(" ", "") in ["adult", "under21"]:
-                                age_round = "wa720_70"
-                            elif age_j.lower().replace(" ", "") in ["50+", "under18"]:
-                                age_round = age_round.replace("70", "60")
-                            elif age_j.lower().replace(" ", "") in ["under16"]:
-                                age_round = "metric_122_50"
-                            if bowstyle.lower() in ["barebow"]:
-                                age_round = age_round.replace("70", "50_b")
-                                age_round = age_round.replace("60", "50_b")
-
-                    # Check aliases
-                    age_round = utils.check_alias(
-                        age_round, age_j, gender, bowstyle.lower()
-                    )
-
-                    results[f"{age_j} {gender}"] = [
-                        sql_to_dol(
-                            query_db(
-                                "SELECT round_name FROM rounds WHERE code_name IN (?)",
-                                [age_round],
-                            )
-                        )["round_name"][0]
-                    ] + [
-                        str(int(i))
-                        for i in class_func.AGB_outdoor_classification_scores(
-                            age_round, bowstyle, gender, age_j
-                        )[-1::-1]
-                    ]
-            classes = classlist[-2::-1]
+            discipline = "outdoor"
+            classlist = list(reference["classes"])
 
         # Field:
-        elif roundfamily in list(roundfamilies.keys())[7:]:
-            all_rounds_objs = load_rounds.read_json_to_round_dict(
-                [
-                    "WA_field.json",
-                ]
-            )
+        elif roundfamily in list(EVENT_FAMILIES.keys())[7:]:
+            discipline = "field"
+            classlist = class_scores.FIELD_CLASSES + ["UC"]
 
-            # Done manually for now, update in future
-            genderlist = sql_to_dol(query_db("SELECT gender FROM genders"))["gender"]
-            agelist = {"age_group": ["Adult", "Under 18"], "peg": ["red", "red"]}
-            classlist = ["GMB", "MB", "B", "1", "2", "3", "UC"]
-
-            if bowstyle.lower() in ["barebow", "longbow", "traditional", "flatbow"]:
-                agelist["peg"] = ["blue", "blue"]
-
-            roundslist = {"code_name": [], "round_name": []}
-            for family_i in roundfamilies[roundfamily]:
-                roundslist_i = sql_to_dol(
-                    query_db(
-                        "SELECT code_name,round_name FROM rounds WHERE family IN (?)",
-                        [family_i],
-                    )
-                )
-                for k in roundslist:
-                    roundslist[k] = roundslist[k] + roundslist_i[k]
-
-            results = {}
-            for gender in genderlist:
-                for j, age_j in enumerate(agelist["age_group"]):
-
-                    # Get appropriate round from distance
-                    age_app_rounds = []
-                    for i, rnd_i in enumerate(roundslist["code_name"]):
-                        if f"{agelist['peg'][j]}" in rnd_i:
-                            age_app_rounds.append(rnd_i)
-
-                    # Ensure 24 target round, not 12 target unit and remove duplicates
-                    age_app_rounds = list(
-                        set([x.replace("12", "24") for x in age_app_rounds])
-                    )
-
-                    results[f"{age_j} {gender}"] = [
-                        sql_to_dol(
-                            query_db(
-                                "SELECT round_name FROM rounds WHERE code_name IN (?)",
-                                age_app_rounds,
-                            )
-                        )["round_name"][0]
-                    ] + [
-                        str(int(i))
-                        for i in class_func.AGB_field_classification_scores(
-                            age_app_rounds[0], bowstyle, gender, age_j
-                        )[-1::-1]
-                    ]
-            classes = classlist[-2::-1]
+        results = {}
+        for gender, age_j, codename, round_name in event_rounds(
+            roundfamily, bowstyle, restrict_to_named
+        ):
+            results[f"{age_j} {gender}"] = [round_name] + [
+                str(int(i))
+                for i in class_scores.classification_scores(
+                    discipline, [codename], bowstyle, gender, age_j
+                )[0, -1::-1]
+            ]
+        classes = classlist[-2::-1]
 
         if error is None:
             # Return the results
@@ -0,0 +1,36 @@
+import pytest
+
+from archerycalculator import create_app
+from archerycalculator.db import init_db
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """App with its database and stored files in a temporary folder."""
+    tmpdir = tmp_path_factory.mktemp("instance")
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE": str(tmpdir / "archerycalculator.sqlite"),
+            "HC_LOOKUP_DIR": str(tmpdir / "hc_lookup"),
+            "CLASS_SCORES_FILE": str(tmpdir / "class_scores.npz"),
+            "SNAPSHOT_FILE": str(tmpdir / "snapshot.bin"),
+            "HANDICAP_BOOK_DIR": str(tmpdir / "handicap_book"),
+            "TEMPLATE_CACHE_DIR": None,
+            "RESPONSE_CACHE": None,
+        }
+    )
+    with app.app_context():
+        init_db()
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,83 @@
+import pytest
+
+from archerycalculator import api, refdata
+
+RECORD = {
+    "round": "York",
+    "score": 900,
+    "bowstyle": "Recurve",
+    "gender": "Male",
+    "age": "Adult",
+}
+
+
+def test_handicap_batch(client):
+    response = client.post("/api/v1/handicap", json=[RECORD, dict(RECORD, score=0)])
+    assert response.status_code == 200
+    good, bad = response.get_json()["results"]
+    assert {"handicap", "decimal_handicap", "classification"} <= set(good)
+    assert "error" in bad
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("score", "nan"),
+        ("score", "NaN"),
+        ("score", "inf"),
+        ("score", "-inf"),
+        ("diameter", "nan"),
+        ("diameter", "inf"),
+    ],
+)
+def test_non_finite_values_are_rejected(client, field, value):
+    response = client.post("/api/v1/handicap", json=[dict(RECORD, **{field: value})])
+    assert response.status_code == 200
+    (result,) = response.get_json()["results"]
+    assert "error" in result
+    assert "handicap" not in result
+
+
+def test_json_nan_score_is_rejected(client):
+    # Flask parses the bare NaN literal allowed by Python's json module
+    response = client.post(
+        "/api/v1/handicap",
+        data='[{"round": "York", "score": NaN, "bowstyle": "Recurve", '
+        '"gender": "Male", "age": "Adult"}]',
+        content_type="application/json",
+    )
+    (result,) = response.get_json()["results"]
+    assert "error" in result
+
+
+@pytest.mark.parametrize(
+    "roundname, bowstyle, gender, codename",
+    [
+        ("Hereford", "Recurve", "Male", "hereford"),
+        ("Bristol I", "Recurve", "Female", "bristol_i"),
+        ("Metric 80-50", "Compound", "Male", "metric_80_50"),
+        ("Metric 122-50", "Barebow", "Female", "metric_122_50"),
+    ],
+)
+def test_check_record_classifies_like_calculator(
+    app_context, roundname, bowstyle, gender, codename
+):
+    # Aliased rounds are classified against the submitted round, as on the
+    # calculator page
+    record = dict(RECORD, round=roundname, score=600, bowstyle=bowstyle, gender=gender)
+    checked, error = api.check_record(record, refdata.get_refdata())
+    assert error is None
+    assert checked["codename"] == codename
+    assert "class_codename" not in checked
+
+
+@pytest.mark.parametrize("field", ["round", "bowstyle", "gender", "age"])
+@pytest.mark.parametrize("value", [[], {}, 1])
+def test_non_string_fields_are_rejected(client, field, value):
+    response = client.post(
+        "/api/v1/handicap", json=[dict(RECORD, **{field: value}), RECORD]
+    )
+    assert response.status_code == 200
+    bad, good = response.get_json()["results"]
+    assert "error" in bad
+    assert "handicap" in good
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from archeryutils.classifications import classifications as class_func
+
+from archerycalculator import class_scores, refdata, registry
+
+ROUNDS = {
+    "outdoor": ["york", "wa1440_90", "wa720_50_c", "metric_80_50"],
+    "indoor": ["portsmouth", "wa18", "wa18_compound"],
+    "field": [
+        "wa_field_24_red_marked",
+        "wa_field_24_blue_unmarked",
+        "wa_field_12_red_marked",
+        "wa_field_12_blue_mixed",
+    ],
+}
+BOWSTYLES = ["compound", "recurve", "barebow", "longbow"]
+CATEGORIES = [
+    (bowstyle, gender, age)
+    for bowstyle in BOWSTYLES
+    for gender in ["male", "female"]
+    for age in ["adult", "50+", "under 16"]
+]
+CALCULATE_FUNCS = {
+    "outdoor": class_func.calculate_AGB_outdoor_classification,
+    "indoor": class_func.calculate_AGB_indoor_classification,
+    "field": class_func.calculate_AGB_field_classification,
+}
+
+
+def _cases():
+    for discipline, codenames in ROUNDS.items():
+        for codename in codenames:
+            yield discipline, codename
+
+
+@pytest.mark.parametrize("discipline,codename", list(_cases()))
+def test_classify_matches_archeryutils(app_context, discipline, codename):
+    longnames = refdata.get_refdata()["class_longnames"]
+    max_score = registry.get_round(codename).max_score()
+    scores = np.unique(np.linspace(0, max_score, 60).astype(int)).astype(float)
+
+    for bowstyle, gender, age in CATEGORIES:
+        expected = [
+            CALCULATE_FUNCS[discipline](codename, score, bowstyle, gender, age)
+            for score in scores
+        ]
+        if discipline == "outdoor":
+            expected = [longnames[c] for c in expected]
+        result = class_scores.classify(
+            discipline, codename, scores, bowstyle, gender, age
+        )
+        assert result == expected, (bowstyle, gender, age)
+
+
+@pytest.mark.parametrize(
+    "codename,bowstyle",
+    [
+        ("wa_field_24_blue_marked", "compound"),
+        ("wa_field_24_blue_marked", "recurve"),
+        ("wa_field_24_red_marked", "barebow"),
+        ("wa_field_24_red_marked", "traditional"),
+        ("wa_field_12_blue_marked", "flatbow"),
+        ("wa_field_12_red_marked", "compound"),
+    ],
+)
+def test_field_classify_checks_pegs(app_context, codename, bowstyle):
+    max_score = registry.get_round(codename).max_score()
+    result = class_scores.classify(
+        "field", codename, [0.0, max_score], bowstyle, "male", "adult"
+    )
+    assert result == ["unclassified", "unclassified"]
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from archeryutils.handicaps import handicap_equations as hc_eq
+from archeryutils.handicaps import handicap_functions as hc_func
+
+from archerycalculator import hc_lookup, registry
+
+ROUNDS = ["york", "wa1440_90", "portsmouth", "wa18_compound", "wa_field_24_red_marked"]
+SCHEMES = ["AGB", "AGBold", "AA", "AA2"]
+
+
+def _sample_scores(codename):
+    # Maximum scores are a special case in archeryutils so are left out
+    max_score = registry.get_round(codename).max_score()
+    return np.unique(np.linspace(1, max_score - 1, 25).astype(int)).astype(float)
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+@pytest.mark.parametrize("codename", ROUNDS)
+def test_integer_handicaps_match_archeryutils(app_context, codename, scheme):
+    scores = _sample_scores(codename)
+    round_obj = registry.get_round(codename)
+    expected = [
+        hc_func.handicap_from_score(
+            score, round_obj, scheme, hc_eq.HcParams(), int_prec=True
+        )
+        for score in scores
+    ]
+    result = hc_lookup.handicap_from_score(scores, codename, scheme, int_prec=True)
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+@pytest.mark.parametrize("codename", ROUNDS)
+def test_decimal_handicaps_match_archeryutils(app_context, codename, scheme):
+    scores = _sample_scores(codename)
+    round_obj = registry.get_round(codename)
+    expected = [
+        hc_func.handicap_from_score(
+            score, round_obj, scheme, hc_eq.HcParams(), int_prec=False
+        )
+        for score in scores
+    ]
+    result = hc_lookup.handicap_from_score(scores, codename, scheme, int_prec=False)
+    np.testing.assert_allclose(result, expected, atol=1.0e-3)
+
+
+def test_custom_diameter_is_solved_directly(app_context):
+    hc_lookup._tables.clear()
+    scores = _sample_scores("york")
+    round_obj = registry.get_round("york")
+    expected = [
+        hc_func.handicap_from_score(
+            score, round_obj, "AGB", hc_eq.HcParams(), arw_d=7.5e-3, int_prec=True
+        )
+        for score in scores
+    ]
+    result = hc_lookup.handicap_from_score(scores, "york", "AGB", diameter=7.5e-3)
+    np.testing.assert_array_equal(result, expected)
+    assert len(hc_lookup._tables) == 0
+
+
+def test_stored_tables_are_reused(app_context, tmp_path):
+    hc_lookup._tables.clear()
+    table = hc_lookup.get_table("york", "AGB", cache_dir=str(tmp_path))
+    stored = list(tmp_path.iterdir())
+    assert [path.suffix for path in stored] == [".npz"]
+
+    # Drop the tables held in memory so the stored copy is read back
+    hc_lookup._tables.clear()
+    reloaded = hc_lookup.get_table("york", "AGB", cache_dir=str(tmp_path))
+    for key, values in table.items():
+        np.testing.assert_array_equal(reloaded[key], values)
@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+from archerycalculator import create_app, refdata, registry, round_search, snapshot
+from archerycalculator.db import data_stamp, init_db
+
+
+@pytest.fixture
+def own_app(tmp_path):
+    """App with a database of its own, for tests that write to it."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE": str(tmp_path / "archerycalculator.sqlite"),
+            "HC_LOOKUP_DIR": str(tmp_path / "hc_lookup"),
+            "CLASS_SCORES_FILE": str(tmp_path / "class_scores.npz"),
+            "SNAPSHOT_FILE": str(tmp_path / "snapshot.bin"),
+            "HANDICAP_BOOK_DIR": str(tmp_path / "handicap_book"),
+            "TEMPLATE_CACHE_DIR": None,
+        }
+    )
+    with app.app_context():
+        init_db()
+    return app
+
+
+def _rename_york(database):
+    # Written directly, as by init-db running in another process
+    db = sqlite3.connect(database)
+    with db:
+        db.execute(
+            "UPDATE rounds SET round_name = 'Yorkshire' WHERE code_name = 'york'"
+        )
+    db.close()
+
+
+def test_rounds_page_conditional(client):
+    response = client.get("/rounds/")
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    again = client.get("/rounds/", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_caches_follow_database_writes(own_app):
+    client = own_app.test_client()
+    before = client.get("/rounds/")
+    with own_app.app_context():
+        assert "York" in refdata.get_refdata()["round_names"]
+
+    _rename_york(own_app.config["DATABASE"])
+
+    after = client.get("/rounds/", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert b"Yorkshire" in after.data
+    with own_app.app_context():
+        assert "Yorkshire" in refdata.get_refdata()["round_names"]
+        results = round_search.search("yorkshire")["results"]
+        assert results[0]["id"] == "Yorkshire"
+
+
+def test_response_cache_follows_database_writes(own_app):
+    client = own_app.test_client()
+    data = {
+        "bowstyle": "Recurve",
+        "gender": "Male",
+        "age": "Adult",
+        "roundname": "York",
+        "score": 900,
+        "diameter": 0,
+        "scheme": "AGB",
+    }
+    first = client.post("/", data=data)
+    assert first.headers["X-Cache"] == "MISS"
+    assert client.post("/", data=data).headers["X-Cache"] == "HIT"
+
+    _rename_york(own_app.config["DATABASE"])
+
+    response = client.post("/", data=data)
+    # York is no longer a valid round
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.data != first.data
+
+
+def test_response_cache_keeps_submitted_values(own_app):
+    client = own_app.test_client()
+    data = {
+        "bowstyle": "Recurve",
+        "gender": "Male",
+        "age": "Adult",
+        "roundname": "York",
+        "score": 900,
+        "diameter": 0,
+        "scheme": "AGB",
+    }
+    client.post("/", data=data)
+
+    # Not the same input as "York", so must not get its cached response
+    response = client.post("/", data={**data, "roundname": " York"})
+    assert response.headers["X-Cache"] == "MISS"
+
+
+def test_unreadable_snapshot_is_ignored(own_app):
+    filename = own_app.config["SNAPSHOT_FILE"]
+    with own_app.app_context():
+        # Current header over a payload that cannot be unpickled
+        header = snapshot.HEADER.pack(snapshot.SNAPSHOT_VERSION, *data_stamp(), 0, 8)
+        with open(filename, "wb") as f:
+            f.write(snapshot.MAGIC + header + b"not a pickle")
+
+        assert not snapshot.load_snapshot(filename)
+        assert "York" in refdata.get_refdata()["round_names"]
+
+
+def test_snapshot_invalidate_resets_rounds(own_app):
+    with own_app.app_context():
+        registry.set_rounds({})
+        snapshot.invalidate()
+        assert registry.get_round_by_name("York") is not None
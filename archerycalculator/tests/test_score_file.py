@@ -0,0 +1,80 @@
+import csv
+import json
+
+from archerycalculator import score_file
+
+HEADER = "round,score,bowstyle,gender,age,scheme,diameter\n"
+
+
+def _read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_csv_keeps_columns_empty_in_first_row(app_context, tmp_path):
+    infile = tmp_path / "results.csv"
+    outfile = tmp_path / "scored.csv"
+    infile.write_text(
+        HEADER
+        + "York,900,Recurve,Male,Adult,,\n"
+        + "York,900,Recurve,Male,Adult,AA,\n"
+        + "WA 18,550,Compound,Female,Adult,,5.5\n"
+    )
+
+    n_records, n_errors = score_file.score_file(str(infile), str(outfile))
+
+    assert (n_records, n_errors) == (3, 0)
+    rows = _read_csv(outfile)
+    assert list(rows[0]) == HEADER.strip().split(",") + score_file.RESULT_FIELDS
+    assert [row["scheme"] for row in rows] == ["", "AA", ""]
+    assert rows[2]["diameter"] == "5.5"
+    assert all(row["handicap"] != "" and row["error"] == "" for row in rows)
+    assert rows[0]["handicap"] != rows[1]["handicap"]
+
+
+def test_invalid_jsonl_lines_give_errors(app_context, tmp_path):
+    record = {
+        "round": "York",
+        "score": 900,
+        "bowstyle": "Recurve",
+        "gender": "Male",
+        "age": "Adult",
+    }
+    infile = tmp_path / "results.jsonl"
+    outfile = tmp_path / "scored.jsonl"
+    infile.write_text(
+        json.dumps(record) + "\n{not json\n[1, 2]\n" + json.dumps(record) + "\n"
+    )
+
+    n_records, n_errors = score_file.score_file(str(infile), str(outfile))
+
+    assert (n_records, n_errors) == (4, 2)
+    first, bad, not_object, last = [
+        json.loads(line) for line in outfile.read_text().splitlines()
+    ]
+    assert bad == {"error": "Invalid JSON object on line 2."}
+    assert not_object == {"error": "Invalid JSON object on line 3."}
+    assert first == last
+    assert "handicap" in first
+
+
+def test_file_matches_api(app_context, client, tmp_path):
+    # Aliased rounds are classified against the submitted round by both
+    records = [
+        {"round": r, "score": s, "bowstyle": b, "gender": g, "age": "Adult"}
+        for r, s in [("Hereford", 900), ("Metric 80-50", 600), ("Metric 122-50", 600)]
+        for b in ["Recurve", "Compound", "Barebow"]
+        for g in ["Male", "Female"]
+    ]
+    infile = tmp_path / "results.jsonl"
+    outfile = tmp_path / "scored.jsonl"
+    infile.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    score_file.score_file(str(infile), str(outfile))
+
+    from_file = [json.loads(line) for line in outfile.read_text().splitlines()]
+    from_api = client.post("/api/v1/handicap", json=records).get_json()["results"]
+    assert not any("error" in result for result in from_api)
+    for file_result, api_result in zip(from_file, from_api):
+        for key in score_file.RESULT_FIELDS:
+            assert file_result.get(key) == api_result.get(key)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from archerycalculator import tables
+
+
+def test_handicap_range():
+    handicaps, error = tables.handicap_range(0.0, 1.0, 0.1)
+    assert error is None
+    np.testing.assert_allclose(handicaps, np.arange(11) / 10.0)
+
+
+@pytest.mark.parametrize(
+    "hc_min, hc_max, hc_step",
+    [
+        (float("nan"), 150.0, 1.0),
+        (0.0, float("nan"), 1.0),
+        (0.0, 150.0, float("nan")),
+        (0.0, float("inf"), 1.0),
+        (float("-inf"), 150.0, 1.0),
+        (0.0, 150.0, 0.0),
+        (150.0, 0.0, 1.0),
+        (0.0, 1.0e6, 1.0),
+    ],
+)
+def test_handicap_range_rejects_invalid(hc_min, hc_max, hc_step):
+    handicaps, error = tables.handicap_range(hc_min, hc_max, hc_step)
+    assert handicaps is None
+    assert error
+
+
+@pytest.mark.parametrize("arg", ["hc_min", "hc_max", "hc_step"])
+@pytest.mark.parametrize("value", ["nan", "inf"])
+def test_handicap_book_rejects_non_finite(client, arg, value):
+    response = client.get(
+        "/tables/handicap/book", query_string={"round": "York", arg: value}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("arg", ["hc_min", "hc_max", "hc_step"])
+@pytest.mark.parametrize("value", ["nan", "sNaN"])
+def test_handicap_tables_form_rejects_nan(client, arg, value):
+    data = {"round1": "York", "hc_min": 0, "hc_max": 150, "hc_step": 1}
+    data[arg] = value
+    response = client.post("/tables/handicap", data=data)
+    assert response.status_code == 200
+    assert b"Handicap range and step must be numbers." in response.data
+    assert b"<table" not in response.data
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from archerycalculator import registry, utils
+
+
+def test_rootfinding_finds_root():
+    result = utils.rootfinding(0.0, 10.0, lambda x, t: x**2 - t, 50.0)
+    assert isinstance(result, float)
+    assert result == pytest.approx(np.sqrt(50.0), abs=1.0e-6)
+
+
+def _reference_order(rounds):
+    # The family by family ordering that order_rounds replaced
+    order = ["york_hereford_bristol", "stgeorge_albion_windsor", "national"]
+    order += ["western", "warwick", "american", "stnicholas", "wa1440"]
+    order += ["metric1440", "wa900", "720", "metriclong", "metricshort"]
+    order += ["wafield", "ifaafield"]
+    sorted_rounds = {}
+    for family in order:
+        if family == "720":
+            tests = [
+                ("wa720", lambda key: "wa720_50_c" not in key),
+                ("metric720", lambda key: "metric_80" not in key),
+                ("wa720", lambda key: "wa720_50_c" in key),
+                ("metric720", lambda key: "metric_80" in key),
+            ]
+        elif family == "wafield":
+            tests = [(None, lambda key: "24" in key)]
+        elif family == "ifaafield":
+            tests = [(None, lambda key: "unit" not in key)]
+        else:
+            tests = [(family, lambda key: True)]
+        for test_family, test in tests:
+            sorted_rounds.update(
+                {
+                    key: value
+                    for key, value in rounds.items()
+                    if test_family in [None, value] and test(key)
+                }
+            )
+    sorted_rounds.update(rounds)
+    return sorted_rounds
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_order_rounds_matches_reference(app_context, seed):
+    families = {
+        codename: round_obj.family
+        for codename, round_obj in registry.get_rounds().items()
+    }
+    # Shuffle so rounds of equal rank are checked to keep their input order
+    codenames = list(families)
+    np.random.default_rng(seed).shuffle(codenames)
+    rounds = {codename: families[codename] for codename in codenames}
+
+    assert list(utils.order_rounds(rounds).items()) == list(
+        _reference_order(rounds).items()
+    )
@@ -0,0 +1,214 @@
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+# Sections of a request that are timed separately
+SECTIONS = ["db", "rounds", "handicap", "classification", "render"]
+
+# Set once any app enables timing so that disabled apps pay a single check
+_enabled = False
+
+
+def _start(name):
+    timings = g.get("_timings") if has_request_context() else None
+    # Sections nested in the same section, e.g. a query while loading reference
+    # data, are only counted once
+    if timings is None or name in g._active:
+        return None
+    g._active.add(name)
+    return time.perf_counter()
+
+
+def _stop(name, start):
+    elapsed = time.perf_counter() - start
+    g._active.discard(name)
+    section = g._timings.setdefault(name, [0.0, 0])
+    section[0] += elapsed
+    section[1] += 1
+
+
+def timed(name):
+    """
+    Decorator recording the time spent in a function against a section.
+
+    Parameters
+    ----------
+    name : str
+        section of the request the function belongs to, one of SECTIONS
+
+    References
+    ----------
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = _start(name)
+            if start is None:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _stop(name, start)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def timer(name):
+    """
+    Context manager recording the time spent in a block against a section.
+
+    Parameters
+    ----------
+    name : str
+        section of the request the block belongs to, one of SECTIONS
+
+    References
+    ----------
+    """
+    start = _start(name) if _enabled else None
+    if start is None:
+        yield
+        return
+    try:
+        yield
+    finally:
+        _stop(name, start)
+
+
+class Metrics:
+    """Totals of request and section timings across requests, per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.sections = {}
+        # Functions returning extra lines for the metrics page
+        self.collectors = []
+
+    def record(self, endpoint, duration, timings):
+        with self.lock:
+            totals = self.requests.setdefault(endpoint, [0.0, 0])
+            totals[0] += duration
+            totals[1] += 1
+            for name, (elapsed, calls) in timings.items():
+                totals = self.sections.setdefault((endpoint, name), [0.0, 0])
+                totals[0] += elapsed
+                totals[1] += calls
+
+    def to_prometheus(self):
+        with self.lock:
+            lines = [
+                "# HELP archerycalculator_requests_total Requests handled.",
+                "# TYPE archerycalculator_requests_total counter",
+            ]
+            for endpoint, (_, count) in self.requests.items():
+                lines.append(
+                    f'archerycalculator_requests_total{{endpoint="{endpoint}"}} {count}'
+                )
+            lines += [
+                "# HELP archerycalculator_request_seconds_total Time spent handling "
+                "requests.",
+                "# TYPE archerycalculator_request_seconds_total counter",
+            ]
+            for endpoint, (elapsed, _) in self.requests.items():
+                lines.append(
+                    "archerycalculator_request_seconds_total"
+                    f'{{endpoint="{endpoint}"}} {elapsed:.6f}'
+                )
+            lines += [
+                "# HELP archerycalculator_section_seconds_total Time spent in each "
+                "section of a request.",
+                "# TYPE archerycalculator_section_seconds_total counter",
+            ]
+            for (endpoint, name), (elapsed, _) in self.sections.items():
+                lines.append(
+                    "archerycalculator_section_seconds_total"
+                    f'{{endpoint="{endpoint}",section="{name}"}} {elapsed:.6f}'
+                )
+            lines += [
+                "# HELP archerycalculator_section_calls_total Calls timed in each "
+                "section of a request.",
+                "# TYPE archerycalculator_section_calls_total counter",
+            ]
+            for (endpoint, name), (_, calls) in self.sections.items():
+                lines.append(
+                    "archerycalculator_section_calls_total"
+                    f'{{endpoint="{endpoint}",section="{name}"}} {calls}'
+                )
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+def _before_request():
+    g._timings = {}
+    g._active = set()
+    g._request_start = time.perf_counter()
+
+
+def _before_render(sender, template, context, **extra):
+    start = _start("render")
+    if start is not None:
+        g._render_start = start
+
+
+def _after_render(sender, template, context, **extra):
+    # Streamed templates finish after the response headers are sent, so their
+    # render time is not reported
+    if has_request_context() and g.get("_render_start") is not None:
+        _stop("render", g.pop("_render_start"))
+
+
+def _after_request(response):
+    timings = g.get("_timings")
+    if timings is None:
+        return response
+    duration = time.perf_counter() - g._request_start
+
+    entries = [
+        f"{name};dur={elapsed * 1e3:.3f}" for name, (elapsed, _) in timings.items()
+    ]
+    entries.append(f"total;dur={duration * 1e3:.3f}")
+    response.headers.add("Server-Timing", ", ".join(entries))
+
+    endpoint = request.endpoint or "unknown"
+    current_app.extensions["timing"].record(endpoint, duration, timings)
+    return response
+
+
+def init_app(app):
+    """
+    Add request timing to the app if TIMING_ENABLED is set in its config.
+
+    Timed sections are reported on each response in a Server-Timing header and
+    accumulated for the /metrics endpoint in Prometheus text format.
+
+    References
+    ----------
+    """
+    global _enabled
+    if not app.config.get("TIMING_ENABLED"):
+        return
+    _enabled = True
+
+    metrics = Metrics()
+    app.extensions["timing"] = metrics
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    def metrics_view():
+        return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -1,6 +1,14 @@
-import numpy as np
+from functools import lru_cache
+import math
+import os
+import tempfile
 
-from archerycalculator.db import query_db, sql_to_dol
+from archerycalculator import timing
+from archerycalculator.db import query_db
+from archerycalculator.lazy import lazy_import
+
+# Imported on first use to keep start up fast
+np = lazy_import("numpy")
 
 
 def check_blacklist(roundlist, age, gender, bowstyle):
@@ -189,6 +197,66 @@ def check_alias(round_codename, age, gender, bowstyle):
     return round_codename
 
 
+# Rules giving the display order of rounds, as (family, test on the codename).
+# A round takes the position of the first rule it matches, with None matching
+# anything. Rounds should already be sorted within families.
+ORDER_RULES = [
+    # OUTDOOR
+    ("york_hereford_bristol", None),
+    ("stgeorge_albion_windsor", None),
+    ("national", None),
+    ("western", None),
+    ("warwick", None),
+    ("american", None),
+    ("stnicholas", None),
+    ("wa1440", None),
+    ("metric1440", None),
+    ("wa900", None),
+    # 720 rounds with the 50m compound and 80cm metric rounds last
+    ("wa720", lambda codename: "wa720_50_c" not in codename),
+    ("metric720", lambda codename: "metric_80" not in codename),
+    ("wa720", lambda codename: "wa720_50_c" in codename),
+    ("metric720", lambda codename: "metric_80" in codename),
+    ("metriclong", None),
+    ("metricshort", None),
+    # INDOOR
+    # FIELD
+    # Select 24 target rounds first, then 12 target units, from any family
+    (None, lambda codename: "24" in codename),
+    # Select full rounds first, then units
+    (None, lambda codename: "unit" not in codename),
+]
+
+
+@lru_cache(maxsize=None)
+def round_rank(codename, family):
+    """
+    Position of a round in the display order.
+
+    Parameters
+    ----------
+    codename : str
+        archeryutils codename of the round
+    family : str
+        family of the round
+
+    Returns
+    -------
+    rank : int
+        index of the first rule in ORDER_RULES the round matches, or the number
+        of rules for rounds that match none of them
+
+    References
+    ----------
+    """
+    for rank, (rule_family, test) in enumerate(ORDER_RULES):
+        if rule_family is not None and rule_family != family:
+            continue
+        if test is None or test(codename):
+            return rank
+    return len(ORDER_RULES)
+
+
 def order_rounds(rounds, age=None, gender=None, bowstyle=None):
     """
     Given an iterator of rounds, sort them into an approved order.
@@ -212,80 +280,13 @@ def order_rounds(rounds, age=None, gender=None, bowstyle=None):
     # if not any(arg is None for arg in (age, gender, bowstyle)):
     #     rounds = [check_alias(round, age, gender, bowstyle) for round in rounds]
 
-    # Sort by family - rounds should already sorted within families. and filtered.
-    order = [
-        # OUTDOOR
-        "york_hereford_bristol",
-        "stgeorge_albion_windsor",
-        "national",
-        "western",
-        "warwick",
-        "american",
-        "stnicholas",
-        "wa1440",
-        "metric1440",
-        "wa900",
-        # 720 have special treatment
-        "720",
-        "metriclong",
-        "metricshort",
-        # INDOOR
-        # FIELD
-        "wafield",
-        "ifaafield",
-    ]
-
-    sorted_rounds = {}
-    for family in order:
-        if family == "720":
-            # Special treatment needed to sort the wa720 and metric720 families
-            sorted_rounds.update(
-                {
-                    key: value
-                    for (key, value) in rounds.items()
-                    if value == "wa720" and "wa720_50_c" not in key
-                }
-            )
-            sorted_rounds.update(
-                {
-                    key: value
-                    for (key, value) in rounds.items()
-                    if value == "metric720" and "metric_80" not in key
-                }
-            )
-            sorted_rounds.update(
-                {
-                    key: value
-                    for (key, value) in rounds.items()
-                    if value == "wa720" and "wa720_50_c" in key
-                }
-            )
-            sorted_rounds.update(
-                {
-                    key: value
-                    for (key, value) in rounds.items()
-                    if value == "metric720" and "metric_80" in key
-                }
-            )
-        elif family == "wafield":
-            # Select 24 target rounds first, then 12 target units
-            sorted_rounds.update(
-                {key: value for (key, value) in rounds.items() if "24" in key}
-            )
-        elif family == "ifaafield":
-            # Select full rounds first, then units
-            sorted_rounds.update(
-                {key: value for (key, value) in rounds.items() if "unit" not in key}
-            )
-        else:
-            sorted_rounds.update(
-                {key: value for (key, value) in rounds.items() if value == family}
-            )
-
-    # Catch any rounds in the list that are not included in the families listed above
-    sorted_rounds.update({codename: rounds[codename] for codename in rounds.keys()})
-
-    return sorted_rounds
+    # Sorting is stable so rounds of equal rank keep their input order
+    return {
+        codename: rounds[codename]
+        for codename in sorted(
+            rounds, key=lambda codename: round_rank(codename, rounds[codename])
+        )
+    }
 
 
 def fetch_and_sort_rounds(location, body):
@@ -309,28 +310,43 @@ def fetch_and_sort_rounds(location, body):
     if not isinstance(body, list):
         body = [body]
 
-    db_rounds = sql_to_dol(
-        query_db(
-            f"""SELECT code_name,round_name,family FROM rounds WHERE location IN ('{"', '".join(location)}') AND body in ('{"', '".join(body)}')"""
+    # Imported here as the snapshot module depends on this one through refdata
+    from archerycalculator import snapshot
+
+    listings = snapshot.get_listings()
+    if listings is not None:
+        # The snapshot holds the rounds table already in display order
+        db_rounds = [
+            {"code_name": row[2], "round_name": row[3]}
+            for row in listings
+            if row[0] in location and row[1] in body
+        ]
+    else:
+        # display_order is set from order_rounds() when the database is built
+        location_params = ",".join("?" * len(location))
+        body_params = ",".join("?" * len(body))
+        db_rounds = query_db(
+            "SELECT code_name,round_name FROM rounds "
+            f"WHERE location IN ({location_params}) AND body IN ({body_params}) "
+            "ORDER BY display_order",
+            location + body,
         )
-    )
-
-    rounds_names = dict(zip(db_rounds["code_name"], db_rounds["round_name"]))
-    rounds_families = dict(zip(db_rounds["code_name"], db_rounds["family"]))
-    ordered_names = list(order_rounds(rounds_families).keys())
 
     return_rounds = {
-        "code_name": ordered_names,
-        "round_name": [rounds_names[codename] for codename in ordered_names],
+        "code_name": [row["code_name"] for row in db_rounds],
+        "round_name": [row["round_name"] for row in db_rounds],
     }
 
     return return_rounds
 
 
+@timing.timed("handicap")
 def rootfinding(x_min, x_max, f_root, *args):
     """
     For bracket and function find the value such that f=0
 
+    Works in python floats to avoid the overhead of numpy scalars.
+
     Parameters
     ----------
     x_min, xmax : float
@@ -351,8 +367,8 @@ def rootfinding(x_min, x_max, f_root, *args):
 
     x = [x_min, x_max]
     f = [
-        f_root(x[0], *args),
-        f_root(x[1], *args),
+        float(f_root(x[0], *args)),
+        float(f_root(x[1], *args)),
     ]
     xtol = 1.0e-16
     rtol = 0.00
@@ -376,7 +392,8 @@ def rootfinding(x_min, x_max, f_root, *args):
         fcur = f[0]
 
     for i in range(50):
-        if (fpre != 0.0) and (fcur != 0.0) and (np.sign(fpre) != np.sign(fcur)):
+        # Both non-zero, so comparing against zero is the same as comparing signs
+        if (fpre != 0.0) and (fcur != 0.0) and ((fpre > 0.0) != (fcur > 0.0)):
             xblk = xpre
             fblk = fpre
             spre = xcur - xpre
@@ -398,12 +415,16 @@ def rootfinding(x_min, x_max, f_root, *args):
             break
 
         if (abs(spre) > delta) and (abs(fcur) < abs(fpre)):
-            if xpre == xblk:
-                stry = -fcur * (xcur - xpre) / (fcur - xpre)
-            else:
-                dpre = (fpre - fcur) / (xpre - xcur)
-                dblk = (fblk - fcur) / (xblk - xcur)
-                stry = -fcur * (fblk - fpre) / (fblk * dpre - fpre * dblk)
+            try:
+                if xpre == xblk:
+                    stry = -fcur * (xcur - xpre) / (fcur - xpre)
+                else:
+                    dpre = (fpre - fcur) / (xpre - xcur)
+                    dblk = (fblk - fcur) / (xblk - xcur)
+                    stry = -fcur * (fblk - fpre) / (fblk * dpre - fpre * dblk)
+            except ZeroDivisionError:
+                # Infinite as with numpy floats, so a bisection step is taken
+                stry = math.inf
 
             if 2 * abs(stry) < min(abs(spre), 3 * abs(sbis) - delta):
                 # accept step
@@ -427,7 +448,7 @@ def rootfinding(x_min, x_max, f_root, *args):
             else:
                 xcur -= delta
 
-        fcur = f_root(xcur, *args)
+        fcur = float(f_root(xcur, *args))
         hc = xcur
     return hc
 
@@ -461,3 +482,36 @@ def group_icons(groupsize):
         return "fa-solid fa-car"
     else:
         return "fa-solid fa-earth-americas"
+
+
+def save_npz(filename, arrays, compressed=False):
+    """
+    Save arrays to an .npz file, replacing any existing file in one step.
+
+    The arrays are written to a temporary file in the same directory first,
+    so processes reading the file never see it half written.
+
+    Parameters
+    ----------
+    filename : str
+        file to save to
+    arrays : dict of str: np.ndarray
+        arrays to save, by name
+    compressed : bool
+        compress the arrays
+
+    References
+    ----------
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as stored:
+            if compressed:
+                np.savez_compressed(stored, **arrays)
+            else:
+                np.savez(stored, **arrays)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
@@ -0,0 +1,299 @@
+"""
+Benchmarks for the archerycalculator pages and core calculations.
+
+Pages are requested through the Flask test client against a freshly built
+database in a temporary directory, so results do not depend on the instance
+folder. Timings are written as JSON and can be compared against a saved
+baseline, failing if any benchmark has slowed by more than a tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+
+import click
+
+from archeryutils.handicaps import handicap_equations as hc_eq
+
+from archerycalculator import create_app, registry, utils
+from archerycalculator.db import init_db, query_db, sql_to_dol
+
+# Form payloads for each page, chosen to exercise the slow paths
+PAGES = {
+    "calculator": (
+        "/",
+        {
+            "bowstyle": "Recurve",
+            "gender": "Female",
+            "age": "Adult",
+            "roundname": "York",
+            "score": "900",
+            "diameter": "0.0",
+            "scheme": "AGB",
+        },
+    ),
+    "calculator_decimal": (
+        "/",
+        {
+            "bowstyle": "Compound",
+            "gender": "Male",
+            "age": "Under 18",
+            "roundname": "WA 18",
+            "score": "550",
+            "diameter": "5.5",
+            "scheme": "AGB",
+            "decimalHC": "y",
+        },
+    ),
+    "handicap_tables": (
+        "/tables/handicap",
+        {
+            "round1": "York",
+            "round2": "Hereford",
+            "round3": "WA 1440 (90m)",
+            "round4": "National",
+            "round5": "Portsmouth",
+            "round6": "WA 18",
+            "round7": "WA 720 (70m)",
+            "round6_compound": "y",
+            "hc_min": "0",
+            "hc_max": "150",
+            "hc_step": "1",
+            "scheme": "AGB",
+        },
+    ),
+    "classification_tables_outdoor": (
+        "/tables/classification",
+        {
+            "bowstyle": "Recurve",
+            "gender": "Male",
+            "age": "Adult",
+            "discipline": "outdoor",
+        },
+    ),
+    "classification_tables_indoor": (
+        "/tables/classification",
+        {
+            "bowstyle": "Compound",
+            "gender": "Female",
+            "age": "Under 16",
+            "discipline": "indoor",
+        },
+    ),
+    "classification_tables_field": (
+        "/tables/classification",
+        {
+            "bowstyle": "Barebow",
+            "gender": "Female",
+            "age": "Adult",
+            "discipline": "field",
+        },
+    ),
+    "event_tables": (
+        "/tables/classbyevent",
+        {"bowstyle": "Recurve", "roundfamily": "WA 1440/Metrics"},
+    ),
+    "event_tables_field": (
+        "/tables/classbyevent",
+        {"bowstyle": "Compound", "roundfamily": "WA Field 24 Marked"},
+    ),
+    "groups": (
+        "/extras/groups",
+        {
+            "known_group_size": "30",
+            "known_group_unit": "cm",
+            "known_dist": "70",
+            "known_dist_unit": "metres",
+        },
+    ),
+    "roundscomparison": (
+        "/extras/roundscomparison",
+        {
+            "roundname": "York",
+            "score": "900",
+            "outdoor": "y",
+            "indoor": "y",
+            "wafield": "y",
+            "ifaafield": "y",
+            "virounds": "y",
+            "unofficial": "y",
+        },
+    ),
+    "rounds_page": ("/rounds", None),
+}
+
+
+def make_app(tmpdir):
+    """Create an app with a newly initialised database in tmpdir."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE": os.path.join(tmpdir, "benchmark.sqlite"),
+            "HC_LOOKUP_DIR": os.path.join(tmpdir, "hc_lookup"),
+            "CLASS_SCORES_FILE": os.path.join(tmpdir, "class_scores.npz"),
+            "SNAPSHOT_FILE": os.path.join(tmpdir, "snapshot.bin"),
+            "HANDICAP_BOOK_DIR": os.path.join(tmpdir, "handicap_book"),
+            "TEMPLATE_CACHE_DIR": os.path.join(tmpdir, "template_cache"),
+            # Time the pages themselves rather than cached responses
+            "RESPONSE_CACHE": None,
+            "RESPONSE_CACHE_FILE": os.path.join(tmpdir, "response_cache.sqlite"),
+        }
+    )
+    with app.app_context():
+        init_db()
+    return app
+
+
+def page_benchmarks(app):
+    """Benchmarks requesting each page with its payload."""
+    client = app.test_client()
+    benchmarks = {}
+    for name, (url, payload) in PAGES.items():
+        if payload is None:
+
+            def request_page(url=url):
+                return client.get(url)
+
+        else:
+
+            def request_page(url=url, payload=payload):
+                return client.post(url, data=payload)
+
+        benchmarks[f"page:{name}"] = request_page
+    return benchmarks
+
+
+def calculation_benchmarks(app):
+    """Benchmarks of the core calculation and database helpers."""
+    hc_params = hc_eq.HcParams()
+    york = registry.get_round("york")
+
+    def f_root(h, scheme, rnd, hc_params):
+        return (
+            hc_eq.score_for_round(rnd, h, scheme, hc_params, round_score_up=False)[0]
+            - 900.0
+        )
+
+    def find_root():
+        return utils.rootfinding(-75, 300, f_root, "AGB", york, hc_params)
+
+    families = {codename: rnd.family for codename, rnd in registry.get_rounds().items()}
+
+    def sort_rounds():
+        return utils.order_rounds(families)
+
+    def convert_rows():
+        with app.app_context():
+            return sql_to_dol(
+                query_db("SELECT code_name,round_name,family,location FROM rounds")
+            )
+
+    return {
+        "calc:rootfinding": find_root,
+        "calc:order_rounds": sort_rounds,
+        "calc:sql_to_dol": convert_rows,
+    }
+
+
+def run(benchmarks, repeat, number):
+    """Time each benchmark, returning per call statistics in seconds."""
+    results = {}
+    for name, func in benchmarks.items():
+        # Warm up caches and check the page works before timing it
+        response = func()
+        status = getattr(response, "status_code", 200)
+        if status != 200:
+            raise click.ClickException(f"{name} returned status {status}.")
+
+        times = [t / number for t in timeit.repeat(func, repeat=repeat, number=number)]
+        results[name] = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "repeat": repeat,
+            "number": number,
+        }
+        click.echo(f"{name:<40} {results[name]['median'] * 1e3:10.3f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare median times against a baseline.
+
+    Returns the names of benchmarks more than tolerance slower than the baseline.
+    """
+    regressions = []
+    click.echo(f"\n{'benchmark':<40} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        click.echo(
+            f"{name:<40} {baseline[name]['median'] * 1e3:8.3f}ms "
+            f"{result['median'] * 1e3:8.3f}ms {ratio:7.2f}{flag}"
+        )
+    return regressions
+
+
+@click.command()
+@click.option(
+    "--output", "-o", default="benchmark_results.json", help="JSON file for results."
+)
+@click.option("--baseline", "-b", default=None, help="JSON results to compare to.")
+@click.option(
+    "--tolerance",
+    default=0.2,
+    show_default=True,
+    help="Allowed fractional slowdown against the baseline.",
+)
+@click.option("--repeat", default=5, show_default=True, help="Timing repeats.")
+@click.option("--number", default=10, show_default=True, help="Calls per repeat.")
+@click.option(
+    "--only", "-k", default=None, help="Only run benchmarks containing this string."
+)
+def main(output, baseline, tolerance, repeat, number, only):
+    """Run the benchmarks and optionally compare them to a baseline."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = make_app(tmpdir)
+        benchmarks = {**page_benchmarks(app), **calculation_benchmarks(app)}
+        if only is not None:
+            benchmarks = {k: v for k, v in benchmarks.items() if only in k}
+        results = run(benchmarks, repeat, number)
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    click.echo(f"\nWrote results to {output}")
+
+    if baseline is not None:
+        with open(baseline) as f:
+            baseline_results = json.load(f)["results"]
+        regressions = compare(results, baseline_results, tolerance)
+        if regressions:
+            raise click.ClickException(
+                f"{len(regressions)} benchmark(s) slower than baseline: "
+                + ", ".join(regressions)
+            )
+
+
+if __name__ == "__main__":
+    main()